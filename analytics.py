@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from catalog import Catalog
+from db import Repository
+
+# Sessions averaged for the estimated 1RM trend
+ROLLING_SESSIONS = 4
+# Sessions without a new top set before an exercise counts as plateaued
+PLATEAU_SESSIONS = 4
+
+
+@dataclass
+class ProgressReport:
+    top_sets: pd.DataFrame        # date x exercise: heaviest set of each session
+    e1rm_trend: pd.DataFrame      # date x exercise: rolling mean of each session's best estimated 1RM
+    weekly_tonnage: pd.DataFrame  # week x exercise: sum of weight x reps over every set
+    plateaus: pd.DataFrame        # exercise: best, sessions since it was set, plateaued flag
+
+
+def load_history(repo: Repository, plans: Catalog, username: str) -> pd.DataFrame:
+    """Every completed set of the user as one columnar frame (date, exercise, weight, total, reps).
+
+    Reps are the planned reps from the program catalog; 1 when the plan has none.
+    A compacted workout (see retention.py) contributes one row per exercise: its
+    top set as ``weight`` and the summed weight of all its sets as ``total``.
+    """
+    with repo.connection() as conn:
+        rows = conn.execute("""
+            SELECT wl.date, wl.program_id, wl.session_index, el.exercise_name, sl.weight, sl.weight
+            FROM workout_logs wl
+            JOIN exercise_logs el ON el.workout_log_id = wl.id
+            JOIN set_logs sl ON sl.exercise_log_id = el.id
+            WHERE wl.username = :username AND sl.completed
+            UNION ALL
+            SELECT wl.date, wl.program_id, wl.session_index, ws.exercise_name, ws.top_weight, ws.total_weight
+            FROM workout_logs wl
+            JOIN workout_summaries ws ON ws.workout_log_id = wl.id
+            WHERE wl.username = :username
+        """, {"username": username}).fetchall()
+    dates, program_ids, session_indexes, exercises, weights, totals = zip(*rows) if rows else ((),) * 6
+    history = pd.DataFrame({
+        "date": pd.to_datetime(np.array(dates, dtype=object)),
+        "program_id": pd.array(program_ids, dtype="Int64"),
+        "session_index": pd.array(session_indexes, dtype="Int64"),
+        "exercise": np.array(exercises, dtype=object),
+        "weight": np.array(weights, dtype=np.float64),
+        "total": np.array(totals, dtype=np.float64),
+    })
+
+    plan = pd.DataFrame(
+        [
+            (program.id, session.index, exercise.name, exercise.reps)
+            for program in plans.programs.values()
+            for session in program.sessions
+            for exercise in session.by_name.values()
+        ],
+        columns=["program_id", "session_index", "exercise", "reps"],
+    ).astype({"program_id": "Int64", "session_index": "Int64"})
+    history = history.merge(plan, how="left", on=["program_id", "session_index", "exercise"])
+    history["reps"] = history["reps"].fillna(1).astype(np.int64)
+    return history[["date", "exercise", "weight", "total", "reps"]]
+
+
+def progress_report(repo: Repository, plans: Catalog, username: str) -> Optional[ProgressReport]:
+    history = load_history(repo, plans, username)
+    if history.empty:
+        return None
+
+    reps = history["reps"].to_numpy()
+    weight = history["weight"].to_numpy()
+    # Epley, as in personal_bests; a single rep is already a 1RM
+    history["e1rm"] = np.where(reps > 1, weight * (1 + reps / 30.0), weight)
+    history["volume"] = history["total"].to_numpy() * np.maximum(reps, 1)
+
+    per_session = (
+        history.groupby(["exercise", "date"], sort=True)
+        .agg(top=("weight", "max"), e1rm=("e1rm", "max"))
+        .reset_index()
+    )
+    by_exercise = per_session.groupby("exercise", sort=False)
+
+    per_session["e1rm_trend"] = (
+        by_exercise["e1rm"].rolling(ROLLING_SESSIONS, min_periods=1).mean().reset_index(level=0, drop=True)
+    )
+
+    # A session sets a new best when its top set beats every earlier session of that exercise
+    previous_best = by_exercise["top"].cummax().groupby(per_session["exercise"]).shift()
+    per_session["new_best"] = previous_best.isna() | (per_session["top"] > previous_best)
+    per_session["session_no"] = by_exercise.cumcount()
+    last_best = per_session[per_session["new_best"]].groupby("exercise")["session_no"].max()
+    plateaus = pd.DataFrame({
+        "best": by_exercise["top"].max(),
+        "sessions_since_best": by_exercise["session_no"].max() - last_best,
+    })
+    plateaus["plateaued"] = plateaus["sessions_since_best"] >= PLATEAU_SESSIONS
+
+    weeks = history["date"].dt.to_period("W-SUN").dt.start_time
+    weekly_tonnage = (
+        history.assign(week=weeks)
+        .pivot_table(index="week", columns="exercise", values="volume", aggfunc="sum", fill_value=0)
+    )
+
+    return ProgressReport(
+        top_sets=per_session.pivot(index="date", columns="exercise", values="top"),
+        e1rm_trend=per_session.pivot(index="date", columns="exercise", values="e1rm_trend"),
+        weekly_tonnage=weekly_tonnage,
+        plateaus=plateaus.sort_values("sessions_since_best", ascending=False),
+    )
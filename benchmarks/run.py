@@ -0,0 +1,247 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import catalog
+from benchmarks.synthetic import generate
+from db import Repository
+from progression import session_targets
+from set_writer import SetWriter
+
+APP = Path(__file__).resolve().parent.parent / "app.py"
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p95_ms": pick(0.95) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def time_calls(fn: Callable[[], object], iterations: int) -> dict[str, float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def bench_queries(repo: Repository, usernames: list[str], iterations: int, rng: random.Random) -> dict:
+    """Time each hot path straight against the repository, bypassing the query cache."""
+    def user() -> str:
+        return rng.choice(usernames)
+
+    program = catalog.load(repo).program(repo.program_id)
+
+    def preview():
+        username = user()
+        session_targets(repo, username, program.session(program.next_session(repo.last_session_index(username))))
+
+    def history():
+        username = user()
+        workouts, _ = repo.workout_page(username, 10)
+        repo.page_sets(tuple(workout[0] for workout in workouts))
+
+    with repo.connection() as conn:
+        exercise_log_ids = [row[0] for row in conn.execute("SELECT id FROM exercise_logs ORDER BY RANDOM() LIMIT 500")]
+
+    def save_set():
+        repo.upsert_set(rng.choice(exercise_log_ids), rng.randint(1, 5), rng.uniform(45, 300))
+
+    # What a rerun pays to log a set now that the background writer commits it
+    writer = SetWriter(lambda _: repo)
+
+    def submit_set():
+        writer.submit(user(), [(rng.choice(exercise_log_ids), rng.randint(1, 5), rng.uniform(45, 300))])
+
+    results = {
+        "resume_detection": time_calls(lambda: repo.find_incomplete_workout(user()), iterations),
+        "next_session_preview": time_calls(preview, iterations),
+        "history_page": time_calls(history, iterations),
+        "personal_bests": time_calls(lambda: repo.personal_bests(user()), iterations),
+        "set_save": time_calls(save_set, iterations),
+        "set_submit": time_calls(submit_set, iterations),
+    }
+    writer.close()
+    return results
+
+
+def simulate_user(db_path: str, username: str, rounds: int, start: "multiprocessing.synchronize.Barrier",
+                  results: "multiprocessing.Queue") -> None:
+    """One simulated user in its own process: AppTest patches the process-wide st.secrets."""
+    from streamlit.testing.v1 import AppTest
+
+    samples: list[float] = []
+    set_samples: list[float] = []
+    errors: list[str] = []
+    at = AppTest.from_file(str(APP), default_timeout=60)
+    at.secrets["db_path"] = db_path
+    at.secrets["credentials"] = {"usernames": {username: {"name": username, "password": "x", "email": ""}}}
+    at.secrets["cookie"] = {"name": "bench", "key": "bench", "expiry_days": 1}
+    at.session_state["authentication_status"] = True
+    at.session_state["username"] = username
+    at.session_state["name"] = username
+
+    def rerun(action=None, into=samples):
+        started = time.perf_counter()
+        (action or at).run()
+        into.append(time.perf_counter() - started)
+        if at.exception:
+            errors.append(f"{username}: {at.exception[0].message}")
+
+    def click(label):
+        return next(b for b in at.button if b.label.startswith(label)).click()
+
+    def page(name):
+        return at.switch_page(f"screens/{name}.py")
+
+    started = time.perf_counter()
+    try:
+        start.wait()
+        started = time.perf_counter()
+        rerun()
+        for _ in range(rounds):
+            rerun(click("📋 Preview"))
+            rerun(page("history"))
+            rerun(page("bests"))
+            rerun(page("home"))
+        # Log the first set of each exercise; AppTest reruns the whole page for each
+        # widget change, where a browser reruns just that exercise's fragment
+        rerun(click("📋 Preview"))
+        rerun(click("✅ Begin"))
+        page("workout")
+        for weight, number_input in enumerate(at.number_input[::5]):
+            rerun(number_input.set_value(100.0 + weight), into=set_samples)
+    except Exception as e:
+        errors.append(f"{username}: {e!r}")
+    results.put((samples, set_samples, errors, time.perf_counter() - started))
+
+
+def bench_reruns(db_path: str, usernames: list[str], concurrency: int, rounds: int) -> dict:
+    """Drive ``concurrency`` simulated users through app.py at once with Streamlit's AppTest.
+
+    Each user runs in a fresh process and all of them start together once loaded.
+    A run with errors reports them without percentiles.
+    """
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(concurrency)
+    queue = context.Queue()
+    processes = [
+        context.Process(target=simulate_user, args=(db_path, usernames[i % len(usernames)], rounds, start, queue))
+        for i in range(concurrency)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    samples = [s for outcome in outcomes for s in outcome[0]]
+    set_samples = [s for outcome in outcomes for s in outcome[1]]
+    errors = [e for outcome in outcomes for e in outcome[2]]
+    result = {"concurrency": concurrency, "wall_s": max(outcome[3] for outcome in outcomes), "errors": errors}
+    if errors:
+        return result
+    if samples:
+        result["rerun"] = percentiles(samples)
+    if set_samples:
+        result["set_rerun"] = percentiles(set_samples)
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=APP.parent, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict) -> None:
+    for name, stats in current["queries"].items():
+        before = baseline.get("queries", {}).get(name)
+        if before:
+            change = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+            print(f"{name:24} p50 {before['p50_ms']:8.3f} -> {stats['p50_ms']:8.3f} ms ({change:+.1f}%)")
+    for key, label in (("rerun", "app rerun"), ("set_rerun", "set logging rerun")):
+        if key in current.get("reruns", {}) and key in baseline.get("reruns", {}):
+            before, after = baseline["reruns"][key]["p95_ms"], current["reruns"][key]["p95_ms"]
+            print(f"{label:24} p95 {before:8.3f} -> {after:8.3f} ms ({(after - before) / before * 100:+.1f}%)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark app.py query paths against synthetic data.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--sets-per-exercise", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per query path")
+    parser.add_argument("--concurrency", type=int, default=8, help="simulated users for the AppTest run (0 to skip)")
+    parser.add_argument("--rounds", type=int, default=3, help="navigation rounds per simulated user")
+    parser.add_argument("--db", help="reuse this database instead of generating one")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", help="earlier results file to print p50/p95 changes against")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "workouts.db")
+        dataset = None
+        if not args.db:
+            dataset = generate(db_path, args.users, args.years, args.sets_per_exercise, seed=args.seed)
+        with sqlite3.connect(db_path) as conn:
+            usernames = [row[0] for row in conn.execute("SELECT DISTINCT username FROM workout_logs")]
+
+        # Work on a copy when timing writes against a user-supplied database
+        if args.db:
+            copy = os.path.join(tmp, "workouts.db")
+            with sqlite3.connect(args.db) as source, sqlite3.connect(copy) as target:
+                source.backup(target)
+            db_path = copy
+
+        repo = Repository(db_path)
+        results = {
+            "commit": git_commit(),
+            "sqlite_version": sqlite3.sqlite_version,
+            "params": vars(args),
+            "dataset": dataset,
+            "queries": bench_queries(repo, usernames, args.iterations, random.Random(args.seed)),
+        }
+        repo.close()
+        if args.concurrency:
+            results["reruns"] = bench_reruns(db_path, usernames, args.concurrency, args.rounds)
+
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    for name, stats in results["queries"].items():
+        print(f"{name:24} p50 {stats['p50_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+    for key, label in (("rerun", "app rerun"), ("set_rerun", "set logging rerun")):
+        if key in results.get("reruns", {}):
+            stats = results["reruns"][key]
+            print(f"{label:24} p50 {stats['p50_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text()))
+    print(f"Results written to {args.output}")
+    errors = results.get("reruns", {}).get("errors")
+    if errors:
+        raise SystemExit("Rerun benchmark failed, no percentiles recorded:\n" + "\n".join(errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.run import APP, git_commit
+from benchmarks.synthetic import generate
+
+SCREENS = ["login", "home", "history", "progress"]
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "streamlit_authenticator"]
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def probe(screen: str, db_path: str, users: int) -> dict:
+    """Run inside a fresh interpreter: one cold and one warm rerun of ``screen``."""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    harness_s, harness_mb = time.perf_counter() - started, rss_mb()
+
+    at = AppTest.from_file(str(APP), default_timeout=120)
+    at.secrets["db_path"] = db_path
+    # Plain-text passwords, as in a fresh secrets.toml: stauth hashes them unless told not to
+    at.secrets["credentials"] = {
+        "usernames": {f"user{i}": {"name": f"User {i}", "password": "x", "email": ""} for i in range(users)}
+    }
+    at.secrets["cookie"] = {"name": "bench", "key": "bench", "expiry_days": 1}
+    if screen != "login":
+        at.session_state["authentication_status"] = True
+        at.session_state["username"] = at.session_state["name"] = "user0"
+        at.switch_page(f"screens/{screen}.py")
+
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - started)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return {
+        "harness_s": harness_s,
+        "cold_s": timings[0],
+        "warm_s": timings[1],
+        "rss_mb": rss_mb() - harness_mb,
+        "modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+
+def bench_screen(screen: str, db_path: str, users: int, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.startup", "--probe", screen, "--db", db_path, "--users", str(users)],
+            cwd=APP.parent, text=True, stderr=subprocess.DEVNULL,
+        )
+        samples.append(json.loads(out.splitlines()[-1]))
+    return {
+        "cold_ms": statistics.median(sample["cold_s"] for sample in samples) * 1000,
+        "warm_ms": statistics.median(sample["warm_s"] for sample in samples) * 1000,
+        "rss_mb": statistics.median(sample["rss_mb"] for sample in samples),
+        "modules": samples[-1]["modules"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time a fresh server process's first and second rerun of each app.py screen."
+    )
+    parser.add_argument("--screens", nargs="+", choices=SCREENS, default=SCREENS)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per screen (medians are reported)")
+    parser.add_argument("--users", type=int, default=3, help="credentials, and synthetic users in the database")
+    parser.add_argument("--db", help="reuse this database instead of generating one")
+    parser.add_argument("--output", default="startup_output.json")
+    parser.add_argument("--compare", help="earlier results file to print changes against")
+    parser.add_argument("--probe", choices=SCREENS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.db, args.users)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "workouts.db")
+        if not args.db:
+            generate(db_path, args.users, 0.5)
+        results = {
+            "commit": git_commit(),
+            "params": vars(args),
+            "screens": {screen: bench_screen(screen, db_path, args.users, args.runs) for screen in args.screens},
+        }
+
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    for screen, stats in results["screens"].items():
+        print(f"{screen:10} cold {stats['cold_ms']:8.1f} ms  warm {stats['warm_ms']:8.1f} ms  "
+              f"+{stats['rss_mb']:6.1f} MB  loaded: {', '.join(stats['modules']) or '-'}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["screens"]
+        for screen, stats in results["screens"].items():
+            if screen in baseline:
+                before = baseline[screen]
+                print(f"{screen:10} cold {before['cold_ms']:8.1f} -> {stats['cold_ms']:8.1f} ms, "
+                      f"warm {before['warm_ms']:8.1f} -> {stats['warm_ms']:8.1f} ms, "
+                      f"rss {before['rss_mb']:6.1f} -> {stats['rss_mb']:6.1f} MB")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import migrations
+import personal_bests
+from program_import import ParsedSession, import_program
+
+EXERCISES = [
+    "Squat", "Bench Press", "Barbell Row", "Overhead Press", "Deadlift",
+    "Chin Up", "Dip", "Front Squat", "Romanian Deadlift", "Incline Press",
+]
+SESSIONS_PER_PROGRAM = 12
+EXERCISES_PER_SESSION = 3
+
+
+def synthetic_program(rng: random.Random, sets_per_exercise: int) -> list[ParsedSession]:
+    return [
+        ParsedSession(
+            f"Session {i}", sets_per_exercise, rng.choice([3, 5, 8]),
+            rng.sample(EXERCISES, EXERCISES_PER_SESSION)
+        )
+        for i in range(1, SESSIONS_PER_PROGRAM + 1)
+    ]
+
+
+def generate(path: str, users: int = 20, years: float = 2.0, sets_per_exercise: int = 5,
+             workouts_per_week: int = 3, seed: int = 0) -> dict[str, int]:
+    """Create a workouts.db at ``path`` with a 12-session program and per-user history.
+
+    Every user works through the program in order, ``workouts_per_week`` times a
+    week for ``years``, logging every set with slowly increasing weights. The
+    last workout of each user is left in progress so resume detection has work
+    to do.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    conn.execute("PRAGMA foreign_keys = ON")
+    with conn:
+        import_program(conn, "Synthetic", synthetic_program(rng, sets_per_exercise))
+    program_id = conn.execute("SELECT id FROM programs WHERE name = 'Synthetic'").fetchone()[0]
+    plan = {}
+    for session_index, exercise_name, sets in conn.execute("""
+        SELECT s.session_index, se.exercise_name, se.sets
+        FROM sessions s JOIN session_exercises se ON se.session_id = s.id
+        WHERE s.program_id = ?
+        ORDER BY se.id
+    """, (program_id,)):
+        plan.setdefault(session_index, []).append((exercise_name, sets))
+
+    workouts_per_user = int(years * 52 * workouts_per_week)
+    start = date.today() - timedelta(days=int(years * 365))
+    totals = {"users": users, "workouts": 0, "sets": 0}
+    with conn:
+        for u in range(users):
+            username = f"user{u}"
+            weights = {name: rng.uniform(45, 135) for name in EXERCISES}
+            for w in range(workouts_per_user):
+                session_index = w % SESSIONS_PER_PROGRAM + 1
+                exercises = plan[session_index]
+                expected = sum(sets for _, sets in exercises)
+                in_progress = w == workouts_per_user - 1
+                workout_date = str(start + timedelta(days=w * 7 // workouts_per_week))
+                workout_log_id = conn.execute("""
+                    INSERT INTO workout_logs
+                        (program_id, session_index, username, date, status, completed_at, expected_sets, logged_sets)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    program_id, session_index, username, workout_date,
+                    "in_progress" if in_progress else "completed", None if in_progress else workout_date,
+                    expected, 1 if in_progress else expected,
+                )).lastrowid
+                set_rows = []
+                for position, (exercise_name, sets) in enumerate(exercises):
+                    exercise_log_id = conn.execute(
+                        "INSERT INTO exercise_logs (workout_log_id, exercise_name) VALUES (?, ?)",
+                        (workout_log_id, exercise_name)
+                    ).lastrowid
+                    weights[exercise_name] += rng.choice([0, 0, 2.5, 5])
+                    # The in-progress workout has only its first set logged
+                    logged = sets if not in_progress else int(position == 0)
+                    set_rows.extend(
+                        (exercise_log_id, n, weights[exercise_name]) for n in range(1, logged + 1)
+                    )
+                conn.executemany(
+                    "INSERT INTO set_logs (exercise_log_id, set_number, weight, completed) VALUES (?, ?, ?, 1)",
+                    set_rows
+                )
+                totals["workouts"] += 1
+                totals["sets"] += len(set_rows)
+            for name in EXERCISES:
+                personal_bests.recompute(conn, username, name)
+    conn.close()
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic workouts.db for benchmarking.")
+    parser.add_argument("path")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--sets-per-exercise", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate(args.path, args.users, args.years, args.sets_per_exercise, seed=args.seed))
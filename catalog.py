@@ -0,0 +1,88 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from db import Repository
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedExercise:
+    name: str
+    sets: int
+    reps: int
+
+
+# Sessions, programs and the catalog hash by identity (eq=False): they hold read-only
+# mappings, and a reloaded catalog must never share query cache entries with the old one
+@dataclass(frozen=True, slots=True, eq=False)
+class PlannedSession:
+    index: int
+    name: str
+    exercises: tuple[PlannedExercise, ...]
+    by_name: Mapping[str, PlannedExercise] = field(repr=False)
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Program:
+    id: int
+    name: str
+    sessions: tuple[PlannedSession, ...]  # in session_index order
+    by_index: Mapping[int, PlannedSession] = field(repr=False)
+
+    def session(self, index: int) -> Optional[PlannedSession]:
+        return self.by_index.get(index)
+
+    def next_session(self, last_index: Optional[int]) -> int:
+        # The rotation wraps around after the last session
+        later = [session.index for session in self.sessions if session.index > (last_index or 0)]
+        if later:
+            return later[0]
+        return self.sessions[0].index if self.sessions else 1
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Catalog:
+    version: int
+    programs: Mapping[int, Program]
+
+    def program(self, program_id: Optional[int]) -> Optional[Program]:
+        return self.programs.get(program_id)
+
+
+def load(repo: Repository) -> Catalog:
+    """Every program, session and planned exercise, read in one query.
+
+    Programs without sessions and sessions without exercises are kept, empty.
+    """
+    with repo.connection() as conn:
+        version = repo.catalog_version(conn)
+        rows = conn.execute("""
+            SELECT p.id, p.name, s.session_index, s.name, se.exercise_name, se.sets, se.reps
+            FROM programs p
+            LEFT JOIN sessions s ON s.program_id = p.id
+            LEFT JOIN session_exercises se ON se.session_id = s.id
+            ORDER BY p.id, s.session_index, se.id
+        """).fetchall()
+
+    plans: dict[int, tuple[str, dict[int, tuple[str, list[PlannedExercise]]]]] = {}
+    for program_id, program_name, session_index, session_name, exercise_name, sets, reps in rows:
+        _, sessions = plans.setdefault(program_id, (program_name, {}))
+        if session_index is None:
+            continue
+        _, exercises = sessions.setdefault(session_index, (session_name, []))
+        if exercise_name is not None:
+            exercises.append(PlannedExercise(exercise_name, sets, reps))
+
+    programs = {}
+    for program_id, (program_name, sessions) in plans.items():
+        planned = tuple(
+            PlannedSession(
+                index, session_name, tuple(exercises),
+                # The first entry wins should a session list an exercise twice
+                MappingProxyType({e.name: e for e in reversed(exercises)}),
+            )
+            for index, (session_name, exercises) in sorted(sessions.items())
+        )
+        programs[program_id] = Program(program_id, program_name, planned,
+                                       MappingProxyType({session.index: session for session in planned}))
+    return Catalog(version, MappingProxyType(programs))
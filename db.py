@@ -0,0 +1,310 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, ContextManager, Iterator, Optional
+
+import personal_bests
+from query_cache import QueryCache
+from storage import Backend, Connection, open_backend
+
+DB_PATH = "workouts.db"
+
+
+class Repository:
+    """Data access for the workout tracker.
+
+    One instance per database is shared by every session of a server process
+    (see ``Tenants`` in tenancy.py), so connections are handed out from a small
+    thread-safe pool instead of being opened per widget. ``database`` is a
+    SQLite path or a ``postgresql://`` URL (see storage.py).
+    """
+
+    def __init__(self, database: str = DB_PATH, pool_size: int = 4, query_cache: Optional[QueryCache] = None,
+                 program: Optional[str] = None, backend: Optional[Backend] = None):
+        self.backend = backend or open_backend(database, pool_size)
+        self.query_cache = query_cache or QueryCache()
+        self.program = program
+        with self.connection() as conn:
+            self.backend.migrate(conn)
+            self.program_id = self._program_id(conn, program)
+
+    def refresh_program(self) -> None:
+        """Resolve ``program_id`` again once the catalog changed (see ``Tenants.sync_catalog``)."""
+        with self.connection() as conn:
+            self.program_id = self._program_id(conn, self.program)
+
+    @staticmethod
+    def _program_id(conn: Connection, program: Optional[str]) -> Optional[int]:
+        # The named program, or the first one loaded when no name is configured
+        if program is None:
+            row = conn.execute("SELECT id FROM programs ORDER BY id LIMIT 1").fetchone()
+        else:
+            row = conn.execute("SELECT id FROM programs WHERE name = ?", (program,)).fetchone()
+            if row is None:
+                raise ValueError(f"Unknown program {program!r}; load it with seed_db.py first")
+        return row[0] if row else None
+
+    def connection(self) -> ContextManager[Connection]:
+        return self.backend.connection()
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[Connection]:
+        """Commit on success, roll back on error.
+
+        ``immediate`` is for batches that read before they write: they start
+        with the write lock (SQLite) or on one snapshot (PostgreSQL).
+        """
+        with self.connection() as conn:
+            if immediate:
+                self.backend.begin_write(conn)
+            try:
+                yield conn
+                # A failed commit rolls back too, so the pool never gets an open transaction back
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def close(self) -> None:
+        self.backend.close()
+
+    def cached(self, username: str, loader: Callable[..., Any], *args: Any) -> Any:
+        """Run a read through the per-user query cache; writes below invalidate it."""
+        return self.query_cache.get_or_load(username, loader.__qualname__, args, lambda: loader(*args))
+
+    # === Programs (the plan itself is read through catalog.py)
+
+    def catalog_version(self, conn: Optional[Connection] = None) -> int:
+        if conn is None:
+            with self.connection() as conn:
+                return self.catalog_version(conn)
+        return conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+
+    # === Workouts
+
+    def last_session_index(self, username: str) -> Optional[int]:
+        # The next session follows the latest one logged, rather than a count of
+        # all workouts, so archived history does not shift the rotation
+        with self.connection() as conn:
+            row = conn.execute("""
+                SELECT session_index FROM workout_logs
+                WHERE username = ? AND program_id = ?
+                ORDER BY id DESC LIMIT 1
+            """, (username, self.program_id)).fetchone()
+        return row[0] if row else None
+
+    def find_incomplete_workout(self, username: str) -> Optional[tuple[int, int]]:
+        # Point lookup on idx_workout_logs_in_progress; the counts are kept up to date on write
+        with self.connection() as conn:
+            return conn.execute("""
+                SELECT id, session_index
+                FROM workout_logs
+                WHERE username = ? AND program_id = ? AND status = 'in_progress'
+                  AND logged_sets < expected_sets
+                ORDER BY id DESC LIMIT 1
+            """, (username, self.program_id)).fetchone()
+
+    def exercise_log_ids(self, workout_log_id: int) -> dict[str, int]:
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, exercise_name FROM exercise_logs WHERE workout_log_id = ?", (workout_log_id,)
+            ).fetchall()
+        return {name: eid for eid, name in rows}
+
+    def create_workout(self, username: str, session_index: int, exercises: list[tuple[str, int]],
+                       on_date: str) -> tuple[int, dict[str, int]]:
+        """Log a new workout for ``(exercise_name, planned_sets)`` pairs; returns its exercise log IDs."""
+        with self.transaction() as conn:
+            workout_log_id = conn.execute("""
+                INSERT INTO workout_logs (program_id, session_index, username, date, expected_sets)
+                VALUES (?, ?, ?, ?, ?)
+                RETURNING id
+            """, (self.program_id, session_index, username, on_date, sum(sets for _, sets in exercises))).fetchone()[0]
+
+            exercise_log_ids = {}
+            for name, _ in exercises:
+                exercise_log_ids[name] = conn.execute(
+                    "INSERT INTO exercise_logs (workout_log_id, exercise_name) VALUES (?, ?) RETURNING id",
+                    (workout_log_id, name)
+                ).fetchone()[0]
+        self.query_cache.bump(username)
+        return workout_log_id, exercise_log_ids
+
+    def finish_workout(self, username: str, workout_log_id: int) -> None:
+        with self.transaction() as conn:
+            conn.execute("""
+                UPDATE workout_logs SET status = 'completed', completed_at = ?
+                WHERE id = ? AND username = ?
+            """, (datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), workout_log_id, username))
+        self.query_cache.bump(username)
+
+    # === Sets
+
+    def get_set_weights(self, exercise_log_id: int) -> list[float]:
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT weight FROM set_logs WHERE exercise_log_id = ? ORDER BY set_number", (exercise_log_id,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def get_set_logs(self, exercise_log_ids: list[int]) -> dict[tuple[int, int], float]:
+        if not exercise_log_ids:
+            return {}
+        placeholders = ", ".join("?" * len(exercise_log_ids))
+        with self.connection() as conn:
+            rows = conn.execute(f"""
+                SELECT exercise_log_id, set_number, weight FROM set_logs
+                WHERE exercise_log_id IN ({placeholders})
+            """, exercise_log_ids).fetchall()
+        return {(eid, set_number): weight for eid, set_number, weight in rows}
+
+    def upsert_set(self, exercise_log_id: int, set_number: int, weight: float) -> None:
+        self.upsert_sets([(exercise_log_id, set_number, weight)])
+
+    def upsert_sets(self, sets: list[tuple[int, int, float]]) -> None:
+        if not sets:
+            return
+        # Reads the previous weights before writing, so take the write lock first
+        with self.transaction(immediate=True) as conn:
+            exercise_log_ids = list({eid for eid, _, _ in sets})
+            placeholders = ", ".join("?" * len(exercise_log_ids))
+            previous = {
+                (eid, set_number): weight for eid, set_number, weight in conn.execute(f"""
+                    SELECT exercise_log_id, set_number, weight FROM set_logs
+                    WHERE exercise_log_id IN ({placeholders})
+                """, exercise_log_ids)
+            }
+            conn.executemany("""
+                INSERT INTO set_logs (exercise_log_id, set_number, weight, completed)
+                VALUES (?, ?, ?, TRUE)
+                ON CONFLICT (exercise_log_id, set_number) DO UPDATE
+                SET weight = excluded.weight, completed = TRUE
+            """, sets)
+            self._refresh_logged_sets(conn, exercise_log_ids)
+            usernames = personal_bests.record_changes(conn, [
+                (eid, previous.get((eid, set_number)), weight) for eid, set_number, weight in sets
+            ])
+        for username in usernames:
+            self.query_cache.bump(username)
+
+    @staticmethod
+    def _refresh_logged_sets(conn: Connection, exercise_log_ids: list[int]) -> None:
+        placeholders = ", ".join("?" * len(exercise_log_ids))
+        conn.execute(f"""
+            UPDATE workout_logs SET logged_sets = (
+                SELECT COUNT(*) FROM exercise_logs el
+                JOIN set_logs sl ON sl.exercise_log_id = el.id
+                WHERE el.workout_log_id = workout_logs.id
+            )
+            WHERE id IN (SELECT workout_log_id FROM exercise_logs WHERE id IN ({placeholders}))
+        """, exercise_log_ids)
+
+    def apply_set_edits(self, inserts: list[tuple[int, int, float]],
+                        updates: list[tuple[int, int, int, float]], deletes: list[int]) -> None:
+        """Apply a batch of history edits in one transaction.
+
+        ``inserts`` are ``(exercise_log_id, set_number, weight)``, ``updates`` are
+        ``(set_log_id, exercise_log_id, set_number, weight)`` and ``deletes`` are
+        set_log ids. The batch must leave set numbers unique per exercise log.
+        """
+        if not (inserts or updates or deletes):
+            return
+        # Read-then-write, like upsert_sets: the background writer may commit the same sets
+        with self.transaction(immediate=True) as conn:
+            changed_ids = [set_log_id for set_log_id, _, _, _ in updates] + list(deletes)
+            placeholders = ", ".join("?" * len(changed_ids))
+            previous = {
+                set_log_id: (eid, weight) for set_log_id, eid, weight in conn.execute(f"""
+                    SELECT id, exercise_log_id, weight FROM set_logs WHERE id IN ({placeholders})
+                """, changed_ids)
+            } if changed_ids else {}
+
+            conn.executemany("DELETE FROM set_logs WHERE id = ?", [(set_log_id,) for set_log_id in deletes])
+            # Park updated sets on unused numbers first so renumbering (e.g. swapping
+            # sets 1 and 2) never collides with UNIQUE(exercise_log_id, set_number)
+            conn.executemany(
+                "UPDATE set_logs SET set_number = -id WHERE id = ?",
+                [(set_log_id,) for set_log_id, _, _, _ in updates]
+            )
+            conn.executemany(
+                "UPDATE set_logs SET exercise_log_id = ?, set_number = ?, weight = ? WHERE id = ?",
+                [(eid, set_number, weight, set_log_id) for set_log_id, eid, set_number, weight in updates]
+            )
+            conn.executemany(
+                "INSERT INTO set_logs (exercise_log_id, set_number, weight, completed) VALUES (?, ?, ?, TRUE)",
+                inserts
+            )
+
+            # A set moved to another exercise log leaves one and joins the other
+            changes = [(eid, None, weight) for eid, _, weight in inserts]
+            changes += [previous[set_log_id] + (None,) for set_log_id in deletes if set_log_id in previous]
+            for set_log_id, eid, _, weight in updates:
+                if set_log_id not in previous:
+                    continue
+                old_eid, old_weight = previous[set_log_id]
+                if old_eid == eid:
+                    changes.append((eid, old_weight, weight))
+                else:
+                    changes += [(old_eid, old_weight, None), (eid, None, weight)]
+            self._refresh_logged_sets(conn, list({eid for eid, _, _ in changes}))
+            usernames = personal_bests.record_changes(conn, changes)
+        for username in usernames:
+            self.query_cache.bump(username)
+
+    # === History / bests
+
+    def workout_page(self, username: str, page_size: int, after: Optional[tuple[str, int]] = None,
+                     start_date: Optional[str] = None, end_date: Optional[str] = None
+                     ) -> tuple[list[tuple], bool]:
+        """Return one page of logged workouts, newest first, and whether older ones remain.
+
+        ``after`` is the ``(date, id)`` of the last workout on the previous page.
+        Rows are ``(id, date, session_index, program_id)``.
+        """
+        after_date, after_id = after or (None, None)
+        with self.connection() as conn:
+            rows = conn.execute("""
+                SELECT wl.id, wl.date, wl.session_index, wl.program_id
+                FROM workout_logs wl
+                WHERE wl.username = :username
+                  AND (CAST(:start_date AS TEXT) IS NULL OR wl.date >= :start_date)
+                  AND (CAST(:end_date AS TEXT) IS NULL OR wl.date <= :end_date)
+                  AND (CAST(:after_date AS TEXT) IS NULL OR (wl.date, wl.id) < (:after_date, :after_id))
+                  AND EXISTS (
+                      SELECT 1 FROM exercise_logs el
+                      JOIN set_logs sl ON sl.exercise_log_id = el.id
+                      WHERE el.workout_log_id = wl.id
+                  )
+                ORDER BY wl.date DESC, wl.id DESC
+                LIMIT :limit
+            """, {
+                "username": username, "start_date": start_date, "end_date": end_date,
+                "after_date": after_date, "after_id": after_id, "limit": page_size + 1,
+            }).fetchall()
+        return rows[:page_size], len(rows) > page_size
+
+    def page_sets(self, workout_log_ids: tuple[int, ...]) -> list[tuple]:
+        """Every exercise log of the given workouts with its sets, in one query.
+
+        Rows are ``(workout_log_id, exercise_log_id, exercise_name, set_log_id,
+        set_number, weight)``; an exercise without sets has a single row of Nones.
+        """
+        if not workout_log_ids:
+            return []
+        placeholders = ", ".join("?" * len(workout_log_ids))
+        with self.connection() as conn:
+            return conn.execute(f"""
+                SELECT el.workout_log_id, el.id, el.exercise_name, sl.id, sl.set_number, sl.weight
+                FROM exercise_logs el
+                LEFT JOIN set_logs sl ON sl.exercise_log_id = el.id
+                WHERE el.workout_log_id IN ({placeholders})
+                ORDER BY el.workout_log_id, el.id, sl.set_number
+            """, workout_log_ids).fetchall()
+
+    def personal_bests(self, username: str) -> list[tuple[str, float, str, float, str]]:
+        with self.connection() as conn:
+            return conn.execute("""
+                SELECT exercise_name, best_weight, best_date, best_e1rm, e1rm_date
+                FROM personal_bests
+                WHERE username = ?
+                ORDER BY exercise_name
+            """, (username,)).fetchall()
@@ -0,0 +1,152 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import pandas as pd
+
+# Columns of the history grid; "id" is the set_log id, hidden and empty on added rows
+COLUMNS = ["Workout", "Exercise", "Set", "Weight", "id"]
+
+
+@dataclass
+class HistoryPage:
+    frame: pd.DataFrame
+    exercise_logs: dict[tuple[str, str], int]  # (workout title, exercise) -> exercise_log_id
+
+
+@dataclass
+class SetEdits:
+    inserts: list[tuple[int, int, float]] = field(default_factory=list)       # (exercise_log_id, set_number, weight)
+    updates: list[tuple[int, int, int, float]] = field(default_factory=list)  # (set_log_id, exercise_log_id, set_number, weight)
+    deletes: list[int] = field(default_factory=list)                          # set_log ids
+
+    def __len__(self) -> int:
+        return len(self.inserts) + len(self.updates) + len(self.deletes)
+
+
+@dataclass
+class CellError:
+    row: int  # 1-based position in the edited grid
+    column: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"Row {self.row}, {self.column}: {self.message}"
+
+
+def build_page(workouts: list[tuple[int, str]], rows: list[tuple]) -> HistoryPage:
+    """Lay out a page of workouts as one grid, a row per set.
+
+    ``workouts`` are ``(workout_log_id, title)`` in display order and ``rows``
+    come from ``Repository.page_sets``. Titles are made unique so the Workout
+    column can identify the workout of an added row.
+    """
+    titles: dict[int, str] = {}
+    for workout_id, title in workouts:
+        titles[workout_id] = f"{title} (#{workout_id})" if title in titles.values() else title
+
+    exercise_logs = {}
+    sets_by_workout: dict[int, list[tuple]] = {}
+    for workout_id, exercise_log_id, exercise, set_log_id, set_number, weight in rows:
+        exercise_logs[(titles[workout_id], exercise)] = exercise_log_id
+        if set_log_id is not None:
+            sets_by_workout.setdefault(workout_id, []).append(
+                (titles[workout_id], exercise, set_number, weight, set_log_id)
+            )
+
+    records = [record for workout_id, _ in workouts for record in sets_by_workout.get(workout_id, [])]
+    frame = pd.DataFrame(records, columns=COLUMNS).astype({"Set": "Int64", "Weight": "float64", "id": "Int64"})
+    return HistoryPage(frame, exercise_logs)
+
+
+def _missing(value: Any) -> bool:
+    return value is None or value is pd.NA or value == "" or (isinstance(value, float) and math.isnan(value))
+
+
+def _number(value: Any) -> Optional[float]:
+    if _missing(value):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def diff_page(page: HistoryPage, edited: pd.DataFrame) -> tuple[SetEdits, list[CellError]]:
+    """Compare the edited grid with the page it was built from.
+
+    Returns the inserts, updates and deletes that turn one into the other, or
+    no edits and every invalid cell when anything fails validation. Added rows
+    without a set number are appended after the exercise's last set.
+    """
+    original = {
+        int(set_log_id): (page.exercise_logs[(workout, exercise)], int(set_number), float(weight))
+        for workout, exercise, set_number, weight, set_log_id in page.frame[COLUMNS].itertuples(index=False)
+    }
+
+    errors: list[CellError] = []
+    valid: list[tuple[int, Optional[int], int, Optional[int], float]] = []  # (row, set_log_id, eid, set, weight)
+    for position, (workout, exercise, set_number, weight, set_log_id) in enumerate(
+            edited[COLUMNS].itertuples(index=False), start=1):
+        # The id column is hidden, but never trust it to point outside this page
+        is_new = _missing(set_log_id) or int(set_log_id) not in original
+        if is_new and all(_missing(value) for value in (workout, exercise, set_number, weight)):
+            continue  # a blank row the user added and never filled in
+        row_errors = len(errors)
+
+        eid = None
+        if _missing(workout):
+            errors.append(CellError(position, "Workout", "choose a workout"))
+        elif _missing(exercise):
+            errors.append(CellError(position, "Exercise", "choose an exercise"))
+        else:
+            eid = page.exercise_logs.get((workout, exercise))
+            if eid is None:
+                errors.append(CellError(position, "Exercise", f"{exercise} isn't part of {workout}"))
+
+        number = _number(set_number)
+        if number is None:
+            if not is_new:
+                errors.append(CellError(position, "Set", "set number is required"))
+        elif math.isnan(number) or number < 1 or number != int(number):
+            errors.append(CellError(position, "Set", f"{set_number!r} isn't a whole number of at least 1"))
+
+        lbs = _number(weight)
+        if lbs is None:
+            errors.append(CellError(position, "Weight", "weight is required"))
+        elif math.isnan(lbs) or lbs < 0:
+            errors.append(CellError(position, "Weight", f"{weight!r} isn't a weight of at least 0"))
+
+        if len(errors) == row_errors:
+            valid.append((position, None if is_new else int(set_log_id), eid,
+                          None if number is None else int(number), lbs))
+
+    # Set numbers must stay unique per exercise log; unnumbered rows go after the last set
+    taken: dict[tuple[int, int], int] = {}
+    for position, _, eid, number, _ in valid:
+        if number is None:
+            continue
+        if (eid, number) in taken:
+            errors.append(CellError(position, "Set", f"set {number} is already on row {taken[(eid, number)]}"))
+        else:
+            taken[(eid, number)] = position
+    if errors:
+        return SetEdits(), errors
+
+    last_set: dict[int, int] = {}
+    for eid, number in taken:
+        last_set[eid] = max(last_set.get(eid, 0), number)
+
+    edits = SetEdits()
+    kept = set()
+    for position, set_log_id, eid, number, lbs in valid:
+        if number is None:
+            number = last_set[eid] = last_set.get(eid, 0) + 1
+        if set_log_id is None:
+            edits.inserts.append((eid, number, lbs))
+        else:
+            kept.add(set_log_id)
+            if original.get(set_log_id) != (eid, number, lbs):
+                edits.updates.append((set_log_id, eid, number, lbs))
+    edits.deletes = [set_log_id for set_log_id in original if set_log_id not in kept]
+    return edits, errors
@@ -0,0 +1,321 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import Any, Iterator, Optional
+
+# The same statement this many times in one rerun is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = 10
+PROMETHEUS_WRITE_INTERVAL = 15.0
+
+logger = logging.getLogger("workout_tracker.perf")
+
+
+@dataclass(slots=True)
+class QueryStat:
+    sql: str
+    params: Any
+    seconds: float
+    rows: int
+    many: bool = False
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    started: float
+    seconds: float = 0.0
+    queries: int = 0
+    children: list["Span"] = field(default_factory=list)
+
+
+class Profile:
+    """Timings of a single script rerun: nested spans plus every SQL statement run."""
+
+    def __init__(self, label: str = "rerun"):
+        self.root = Span(label, time.perf_counter())
+        self.queries: list[QueryStat] = []
+        self._stack = [self.root]
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Span]:
+        child = Span(name, time.perf_counter())
+        self._stack[-1].children.append(child)
+        self._stack.append(child)
+        try:
+            yield child
+        finally:
+            child.seconds = time.perf_counter() - child.started
+            self._stack.pop()
+
+    def record(self, stat: QueryStat) -> None:
+        self.queries.append(stat)
+        for span in self._stack:
+            span.queries += 1
+
+    def finish(self) -> None:
+        self.root.seconds = time.perf_counter() - self.root.started
+
+    def flatten(self) -> list[tuple[int, Span]]:
+        # (depth, span) in depth-first order, for the flame-style breakdown
+        out, pending = [], [(0, self.root)]
+        while pending:
+            depth, span = pending.pop()
+            out.append((depth, span))
+            pending.extend((depth + 1, child) for child in reversed(span.children))
+        return out
+
+    def slowest(self, n: int = 5) -> list[QueryStat]:
+        return sorted(self.queries, key=lambda q: q.seconds, reverse=True)[:n]
+
+    def repeated(self) -> list[tuple[str, int]]:
+        counts = Counter(q.sql for q in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count >= N_PLUS_ONE_THRESHOLD]
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "screen": self.root.name,
+            "seconds": round(self.root.seconds, 6),
+            "queries": len(self.queries),
+            "rows": sum(q.rows for q in self.queries),
+            "query_seconds": round(sum(q.seconds for q in self.queries), 6),
+            "spans": {span.name: round(span.seconds, 6) for _, span in self.flatten()[1:]},
+            "repeated": [{"sql": " ".join(sql.split()), "count": count} for sql, count in self.repeated()],
+        }
+
+
+# === Active profile of the script thread running the current rerun
+
+_local = threading.local()
+
+
+def current() -> Optional[Profile]:
+    return getattr(_local, "profile", None)
+
+
+def begin_rerun(state: Any, label: str = "rerun") -> Profile:
+    """Start profiling this rerun; the previous (complete) rerun of the session is exported.
+
+    Streamlit can end a script early (st.rerun, st.stop), so the profile is
+    closed at the start of the next rerun instead of at the end of this one.
+    """
+    previous = state.get("profile")
+    if previous is not None and previous.root.seconds == 0.0:
+        previous.finish()
+        export(previous)
+    profile = Profile(label)
+    state["profile"] = profile
+    state["last_profile"] = previous
+    _local.profile = profile
+    return profile
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    profile = current()
+    if profile is None:
+        yield
+        return
+    with profile.span(name):
+        yield
+
+
+def _record(sql: str, params: Any, seconds: float, rows: int, many: bool = False) -> Optional[QueryStat]:
+    profile = current()
+    if profile is None:
+        return None
+    stat = QueryStat(sql, params, seconds, rows, many)
+    profile.record(stat)
+    return stat
+
+
+# === Query tracing; SQLite connections are opened with factory=TracedConnection
+
+class TracedCursor(sqlite3.Cursor):
+    _stat: Optional[QueryStat] = None
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._stat = _record(sql, parameters, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._stat = _record(sql, None, time.perf_counter() - started, max(self.rowcount, 0), many=True)
+
+    # SQLite produces rows lazily, so fetch time and row counts are added to the statement
+    def _fetched(self, started: float, rows: int) -> None:
+        if self._stat is not None:
+            self._stat.seconds += time.perf_counter() - started
+            self._stat.rows += rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._fetched(started, 1)
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class TracedCursorProxy:
+    """The same tracing around any other DB-API cursor (e.g. psycopg's)."""
+
+    def __init__(self, cursor: Any):
+        self._cursor = cursor
+        self._stat: Optional[QueryStat] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def execute(self, sql, parameters=None):
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(sql, parameters)
+            return self
+        finally:
+            self._stat = _record(sql, parameters, time.perf_counter() - started, max(self._cursor.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_parameters)
+            return self
+        finally:
+            self._stat = _record(sql, None, time.perf_counter() - started, max(self._cursor.rowcount, 0), many=True)
+
+    def _fetched(self, started: float, rows: int) -> None:
+        if self._stat is not None:
+            self._stat.seconds += time.perf_counter() - started
+            self._stat.rows += rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+
+# === Export: rotating JSON log and Prometheus text file, both optional
+
+_metrics_lock = threading.Lock()
+_metrics: dict[str, dict[str, float]] = {}
+_prometheus_path: Optional[str] = None
+_prometheus_written = 0.0
+
+
+def configure(log_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+              max_bytes: int = 5_000_000, backups: int = 3) -> None:
+    global _prometheus_path
+    if log_path and not logger.handlers:
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backups)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    _prometheus_path = prometheus_path
+
+
+def export(profile: Profile) -> None:
+    summary = profile.summary()
+    if logger.handlers:
+        logger.info(json.dumps({"ts": time.time(), **summary}))
+    with _metrics_lock:
+        screen = _metrics.setdefault(summary["screen"], Counter())
+        screen["reruns"] += 1
+        screen["seconds"] += summary["seconds"]
+        screen["queries"] += summary["queries"]
+        screen["rows"] += summary["rows"]
+        screen["query_seconds"] += summary["query_seconds"]
+        screen["n_plus_one"] += len(summary["repeated"])
+    _write_prometheus()
+
+
+def _write_prometheus() -> None:
+    global _prometheus_written
+    if not _prometheus_path:
+        return
+    now = time.monotonic()
+    with _metrics_lock:
+        if now - _prometheus_written < PROMETHEUS_WRITE_INTERVAL:
+            return
+        _prometheus_written = now
+        metrics = {screen: dict(values) for screen, values in _metrics.items()}
+
+    lines = []
+    for name, key, kind, help_text in (
+        ("workout_reruns_total", "reruns", "counter", "Script reruns"),
+        ("workout_rerun_seconds_total", "seconds", "counter", "Wall time spent in reruns"),
+        ("workout_queries_total", "queries", "counter", "SQL statements executed"),
+        ("workout_query_rows_total", "rows", "counter", "Rows returned or changed by SQL statements"),
+        ("workout_query_seconds_total", "query_seconds", "counter", "Wall time spent in SQL"),
+        ("workout_n_plus_one_total", "n_plus_one", "counter", "Statements repeated enough to look like N+1"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for screen, values in sorted(metrics.items()):
+            lines.append(f'{name}{{screen="{screen}"}} {values.get(key, 0)}')
+    tmp_path = f"{_prometheus_path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, _prometheus_path)
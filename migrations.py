@@ -0,0 +1,397 @@
+import sqlite3
+
+# Each entry upgrades the schema by one version; the current version is stored
+# in PRAGMA user_version. Never edit a shipped migration, append a new one.
+MIGRATIONS = [
+    # 1: baseline tables (as created by seed_db.py) plus indexes for the hot queries
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_index INTEGER UNIQUE,
+        name TEXT
+    );
+    CREATE TABLE IF NOT EXISTS session_exercises (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER,
+        exercise_name TEXT,
+        sets INTEGER,
+        reps INTEGER,
+        FOREIGN KEY (session_id) REFERENCES sessions(id)
+    );
+    CREATE TABLE IF NOT EXISTS workout_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_index INTEGER,
+        username TEXT,
+        date TEXT
+    );
+    CREATE TABLE IF NOT EXISTS exercise_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        workout_log_id INTEGER,
+        exercise_name TEXT,
+        FOREIGN KEY (workout_log_id) REFERENCES workout_logs(id)
+    );
+    CREATE TABLE IF NOT EXISTS set_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        exercise_log_id INTEGER,
+        set_number INTEGER,
+        weight REAL,
+        completed BOOLEAN,
+        FOREIGN KEY (exercise_log_id) REFERENCES exercise_logs(id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_workout_logs_user_session_date
+        ON workout_logs (username, session_index, date);
+    CREATE INDEX IF NOT EXISTS idx_exercise_logs_workout_exercise
+        ON exercise_logs (workout_log_id, exercise_name);
+    CREATE INDEX IF NOT EXISTS idx_set_logs_exercise_set
+        ON set_logs (exercise_log_id, set_number, weight);
+    CREATE INDEX IF NOT EXISTS idx_session_exercises_session
+        ON session_exercises (session_id);
+    """,
+    # 2: rebuild child tables with ON DELETE CASCADE and one row per (exercise log, set)
+    """
+    CREATE TABLE session_exercises_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER,
+        exercise_name TEXT,
+        sets INTEGER,
+        reps INTEGER,
+        FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+    );
+    INSERT INTO session_exercises_new (id, session_id, exercise_name, sets, reps)
+        SELECT id, session_id, exercise_name, sets, reps FROM session_exercises;
+    DROP TABLE session_exercises;
+    ALTER TABLE session_exercises_new RENAME TO session_exercises;
+    CREATE INDEX idx_session_exercises_session ON session_exercises (session_id);
+
+    CREATE TABLE exercise_logs_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        workout_log_id INTEGER,
+        exercise_name TEXT,
+        FOREIGN KEY (workout_log_id) REFERENCES workout_logs(id) ON DELETE CASCADE
+    );
+    INSERT INTO exercise_logs_new (id, workout_log_id, exercise_name)
+        SELECT id, workout_log_id, exercise_name FROM exercise_logs;
+    DROP TABLE exercise_logs;
+    ALTER TABLE exercise_logs_new RENAME TO exercise_logs;
+    CREATE INDEX idx_exercise_logs_workout_exercise ON exercise_logs (workout_log_id, exercise_name);
+
+    -- Duplicate sets (possible before this constraint existed) keep their latest row
+    CREATE TABLE set_logs_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        exercise_log_id INTEGER,
+        set_number INTEGER,
+        weight REAL,
+        completed BOOLEAN,
+        UNIQUE (exercise_log_id, set_number),
+        FOREIGN KEY (exercise_log_id) REFERENCES exercise_logs(id) ON DELETE CASCADE
+    );
+    INSERT INTO set_logs_new (id, exercise_log_id, set_number, weight, completed)
+        SELECT id, exercise_log_id, set_number, weight, completed FROM set_logs
+        WHERE id IN (SELECT MAX(id) FROM set_logs GROUP BY exercise_log_id, set_number);
+    DROP TABLE set_logs;
+    ALTER TABLE set_logs_new RENAME TO set_logs;
+    CREATE INDEX idx_set_logs_exercise_set ON set_logs (exercise_log_id, set_number, weight);
+
+    CREATE INDEX IF NOT EXISTS idx_workout_logs_user_date ON workout_logs (username, date);
+    """,
+    # 3: personal bests maintained on write, backfilled from existing completed sets
+    """
+    CREATE TABLE personal_bests (
+        username TEXT NOT NULL,
+        exercise_name TEXT NOT NULL,
+        best_weight REAL NOT NULL,
+        best_date TEXT,
+        best_e1rm REAL NOT NULL,
+        e1rm_date TEXT,
+        PRIMARY KEY (username, exercise_name)
+    ) WITHOUT ROWID;
+
+    WITH facts AS (
+        SELECT wl.username, el.exercise_name, wl.date, sl.weight,
+               (SELECT se.reps FROM sessions s
+                JOIN session_exercises se ON se.session_id = s.id
+                WHERE s.session_index = wl.session_index AND se.exercise_name = el.exercise_name
+                LIMIT 1) AS reps
+        FROM workout_logs wl
+        JOIN exercise_logs el ON el.workout_log_id = wl.id
+        JOIN set_logs sl ON sl.exercise_log_id = el.id
+        WHERE sl.completed = 1
+    ),
+    ranked AS (
+        SELECT username, exercise_name, date, weight, e1rm,
+               ROW_NUMBER() OVER (PARTITION BY username, exercise_name ORDER BY weight DESC, date) AS weight_rank,
+               ROW_NUMBER() OVER (PARTITION BY username, exercise_name ORDER BY e1rm DESC, date) AS e1rm_rank
+        FROM (
+            SELECT *, CASE WHEN reps > 1 THEN weight * (1 + reps / 30.0) ELSE weight END AS e1rm FROM facts
+        )
+    )
+    INSERT INTO personal_bests (username, exercise_name, best_weight, best_date, best_e1rm, e1rm_date)
+    SELECT w.username, w.exercise_name, w.weight, w.date, e.e1rm, e.date
+    FROM ranked w
+    JOIN ranked e ON e.username = w.username AND e.exercise_name = w.exercise_name AND e.e1rm_rank = 1
+    WHERE w.weight_rank = 1;
+    """,
+    # 4: named programs; sessions belong to a program and each workout records its program.
+    # The existing program is named after the sheet seed_db.py used to load.
+    """
+    CREATE TABLE programs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE
+    );
+    INSERT INTO programs (id, name) SELECT 1, 'Workout - Sheet1' WHERE EXISTS (SELECT 1 FROM sessions);
+
+    CREATE TABLE sessions_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        program_id INTEGER NOT NULL,
+        session_index INTEGER NOT NULL,
+        name TEXT,
+        UNIQUE (program_id, session_index),
+        FOREIGN KEY (program_id) REFERENCES programs(id) ON DELETE CASCADE
+    );
+    INSERT INTO sessions_new (id, program_id, session_index, name)
+        SELECT id, 1, session_index, name FROM sessions;
+    DROP TABLE sessions;
+    ALTER TABLE sessions_new RENAME TO sessions;
+
+    ALTER TABLE workout_logs ADD COLUMN program_id INTEGER REFERENCES programs(id);
+    UPDATE workout_logs SET program_id = (SELECT id FROM programs WHERE id = 1);
+    DROP INDEX idx_workout_logs_user_session_date;
+    CREATE INDEX idx_workout_logs_user_program_session
+        ON workout_logs (username, program_id, session_index, date);
+    """,
+    # 5: completion tracking. Workouts from earlier days were never resumable, so
+    # they are backfilled as completed along with any that have every set logged.
+    """
+    ALTER TABLE workout_logs ADD COLUMN status TEXT NOT NULL DEFAULT 'in_progress';
+    ALTER TABLE workout_logs ADD COLUMN completed_at TEXT;
+    ALTER TABLE workout_logs ADD COLUMN expected_sets INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE workout_logs ADD COLUMN logged_sets INTEGER NOT NULL DEFAULT 0;
+
+    UPDATE workout_logs SET
+        expected_sets = COALESCE((
+            SELECT SUM(se.sets) FROM sessions s
+            JOIN session_exercises se ON se.session_id = s.id
+            WHERE s.program_id = workout_logs.program_id AND s.session_index = workout_logs.session_index
+        ), 0),
+        logged_sets = (
+            SELECT COUNT(*) FROM exercise_logs el
+            JOIN set_logs sl ON sl.exercise_log_id = el.id
+            WHERE el.workout_log_id = workout_logs.id
+        );
+    UPDATE workout_logs SET status = 'completed', completed_at = date
+        WHERE logged_sets >= expected_sets OR date < DATE('now');
+
+    CREATE INDEX idx_workout_logs_in_progress
+        ON workout_logs (username, program_id, id) WHERE status = 'in_progress';
+    """,
+    # 6: a counter bumped whenever programs change, so servers know to reload their
+    # in-memory program catalog (catalog.py)
+    """CREATE TABLE catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    INSERT INTO catalog_version (id, version) VALUES (1, 1);
+    """,
+    # 7: per-exercise rollups of old workouts whose set rows were compacted away (retention.py)
+    """
+    CREATE TABLE workout_summaries (
+        workout_log_id INTEGER NOT NULL REFERENCES workout_logs(id) ON DELETE CASCADE,
+        exercise_name TEXT NOT NULL,
+        sets INTEGER NOT NULL,
+        top_weight REAL NOT NULL,
+        total_weight REAL NOT NULL,
+        PRIMARY KEY (workout_log_id, exercise_name)
+    ) WITHOUT ROWID;
+    """,
+    # 8: the bests reached in workouts moved out to archive files (training_log.py),
+    # so recomputing personal bests still counts them
+    """
+    CREATE TABLE archived_bests (
+        username TEXT NOT NULL,
+        exercise_name TEXT NOT NULL,
+        best_weight REAL NOT NULL,
+        best_date TEXT,
+        best_e1rm REAL NOT NULL,
+        e1rm_date TEXT,
+        PRIMARY KEY (username, exercise_name)
+    ) WITHOUT ROWID;
+    """,
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def statements(script: str) -> list[str]:
+    # Split on the semicolons that end a complete statement, so literals and
+    # comments may contain one
+    result, statement = [], ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \n;"):
+                result.append(statement)
+            statement = ""
+    return result
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations in order and return the resulting version.
+
+    Safe to run from several processes at once: each step takes the write lock
+    and re-reads the version, so a step another process applied meanwhile is skipped.
+    """
+    version = schema_version(conn)
+    if version > LATEST_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this app supports ({LATEST_VERSION})"
+        )
+    if version == LATEST_VERSION:
+        return version
+
+    # Table rebuilds must not cascade deletes; the pragma is a no-op inside a transaction
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for target in range(version + 1, LATEST_VERSION + 1):
+            # Statements run one by one inside an explicit transaction (executescript
+            # would commit it first), so each migration and its version bump commit
+            # (or fail) together under the lock
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if schema_version(conn) < target:
+                    for statement in statements(MIGRATIONS[target - 1]):
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        version = schema_version(conn)
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+    return version
+
+
+# === PostgreSQL has no legacy databases to upgrade, so it starts from the schema
+# SQLite reaches at version 5. Each later SQLite migration needs a counterpart
+# here under the same version number; versions are kept in schema_version.
+POSTGRES_MIGRATIONS = {
+    5: """
+    CREATE TABLE programs (
+        id BIGSERIAL PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE sessions (
+        id BIGSERIAL PRIMARY KEY,
+        program_id BIGINT NOT NULL REFERENCES programs(id) ON DELETE CASCADE,
+        session_index INTEGER NOT NULL,
+        name TEXT,
+        UNIQUE (program_id, session_index)
+    );
+    CREATE TABLE session_exercises (
+        id BIGSERIAL PRIMARY KEY,
+        session_id BIGINT REFERENCES sessions(id) ON DELETE CASCADE,
+        exercise_name TEXT,
+        sets INTEGER,
+        reps INTEGER
+    );
+    CREATE TABLE workout_logs (
+        id BIGSERIAL PRIMARY KEY,
+        session_index INTEGER,
+        username TEXT,
+        date TEXT,
+        program_id BIGINT REFERENCES programs(id),
+        status TEXT NOT NULL DEFAULT 'in_progress',
+        completed_at TEXT,
+        expected_sets INTEGER NOT NULL DEFAULT 0,
+        logged_sets INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE exercise_logs (
+        id BIGSERIAL PRIMARY KEY,
+        workout_log_id BIGINT REFERENCES workout_logs(id) ON DELETE CASCADE,
+        exercise_name TEXT
+    );
+    CREATE TABLE set_logs (
+        id BIGSERIAL PRIMARY KEY,
+        exercise_log_id BIGINT REFERENCES exercise_logs(id) ON DELETE CASCADE,
+        set_number INTEGER,
+        weight DOUBLE PRECISION,
+        completed BOOLEAN,
+        UNIQUE (exercise_log_id, set_number)
+    );
+    CREATE TABLE personal_bests (
+        username TEXT NOT NULL,
+        exercise_name TEXT NOT NULL,
+        best_weight DOUBLE PRECISION NOT NULL,
+        best_date TEXT,
+        best_e1rm DOUBLE PRECISION NOT NULL,
+        e1rm_date TEXT,
+        PRIMARY KEY (username, exercise_name)
+    );
+    CREATE INDEX idx_session_exercises_session ON session_exercises (session_id);
+    CREATE INDEX idx_exercise_logs_workout_exercise ON exercise_logs (workout_log_id, exercise_name);
+    CREATE INDEX idx_set_logs_exercise_set ON set_logs (exercise_log_id, set_number, weight);
+    CREATE INDEX idx_workout_logs_user_date ON workout_logs (username, date);
+    CREATE INDEX idx_workout_logs_user_program_session
+        ON workout_logs (username, program_id, session_index, date);
+    CREATE INDEX idx_workout_logs_in_progress
+        ON workout_logs (username, program_id, id) WHERE status = 'in_progress';
+    """,
+    6: """CREATE TABLE catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    INSERT INTO catalog_version (id, version) VALUES (1, 1);
+    """,
+    7: """
+    CREATE TABLE workout_summaries (
+        workout_log_id BIGINT NOT NULL REFERENCES workout_logs(id) ON DELETE CASCADE,
+        exercise_name TEXT NOT NULL,
+        sets INTEGER NOT NULL,
+        top_weight DOUBLE PRECISION NOT NULL,
+        total_weight DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (workout_log_id, exercise_name)
+    );
+    """,
+    8: """
+    CREATE TABLE archived_bests (
+        username TEXT NOT NULL,
+        exercise_name TEXT NOT NULL,
+        best_weight DOUBLE PRECISION NOT NULL,
+        best_date TEXT,
+        best_e1rm DOUBLE PRECISION NOT NULL,
+        e1rm_date TEXT,
+        PRIMARY KEY (username, exercise_name)
+    );
+    """,
+}
+
+
+def migrate_postgres(conn) -> int:
+    """Bring a PostgreSQL schema up to date; safe to run from several servers at once."""
+    if max(POSTGRES_MIGRATIONS) != LATEST_VERSION:
+        raise RuntimeError(f"SQLite migration {LATEST_VERSION} has no PostgreSQL counterpart")
+    # Servers starting together wait for the first one to finish
+    conn.execute("SELECT pg_advisory_xact_lock(hashtext('workout_tracker.migrate'))")
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    if version > LATEST_VERSION:
+        conn.rollback()
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this app supports ({LATEST_VERSION})"
+        )
+    # A new database starts from the baseline, the lowest version; later ones apply in order
+    for target, script in sorted(POSTGRES_MIGRATIONS.items()):
+        if target > version:
+            conn.execute(script)
+            version = target
+    conn.execute("DELETE FROM schema_version")
+    conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+    conn.commit()
+    return version
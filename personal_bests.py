@@ -0,0 +1,171 @@
+from typing import Optional
+
+from storage import Connection
+
+# Planned reps for a logged exercise, used for the estimated one-rep max
+PLANNED_REPS_SQL = """
+    (SELECT se.reps FROM sessions s
+     JOIN session_exercises se ON se.session_id = s.id
+     WHERE s.program_id = wl.program_id AND s.session_index = wl.session_index
+       AND se.exercise_name = el.exercise_name
+     LIMIT 1)
+"""
+
+# A user's completed sets, with the estimated 1RM (Epley), in the workouts {where}
+# selects. Compacted workouts count with their top set; a summary row stands in for el there.
+FACTS_SQL = f"""
+    SELECT el.exercise_name, wl.date, sl.weight, {PLANNED_REPS_SQL} AS reps
+    FROM workout_logs wl
+    JOIN exercise_logs el ON el.workout_log_id = wl.id
+    JOIN set_logs sl ON sl.exercise_log_id = el.id
+    WHERE wl.username = :username AND {{where}} AND sl.completed
+    UNION ALL
+    SELECT el.exercise_name, wl.date, el.top_weight, {PLANNED_REPS_SQL}
+    FROM workout_logs wl
+    JOIN workout_summaries el ON el.workout_log_id = wl.id
+    WHERE wl.username = :username AND {{where}}
+"""
+E1RM_SQL = "CASE WHEN reps > 1 THEN weight * (1 + reps / 30.0) ELSE weight END"
+
+# Recomputes the bests of one (username, exercise) from its completed sets and
+# the bests kept from archived workouts. The heaviest set and the best estimated
+# 1RM keep the date first reached.
+RECOMPUTE_SQL = f"""
+    WITH facts AS ({FACTS_SQL.format(where="el.exercise_name = :exercise_name")}),
+    heaviest AS (
+        SELECT weight, date FROM facts
+        UNION ALL
+        SELECT best_weight, best_date FROM archived_bests
+        WHERE username = :username AND exercise_name = :exercise_name
+        ORDER BY weight DESC, date LIMIT 1
+    ),
+    strongest AS (
+        SELECT {E1RM_SQL} AS e1rm, date FROM facts
+        UNION ALL
+        SELECT best_e1rm, e1rm_date FROM archived_bests
+        WHERE username = :username AND exercise_name = :exercise_name
+        ORDER BY e1rm DESC, date LIMIT 1
+    )
+    INSERT INTO personal_bests (username, exercise_name, best_weight, best_date, best_e1rm, e1rm_date)
+    SELECT :username, :exercise_name, heaviest.weight, heaviest.date, strongest.e1rm, strongest.date
+    FROM heaviest, strongest
+"""
+
+# Folds the bests of the user's completed workouts dated before :before into
+# archived_bests, for training_log.archive_user to run before it deletes them
+ARCHIVE_SQL = f"""
+    WITH facts AS ({FACTS_SQL.format(where="wl.status = 'completed' AND wl.date < :before")}),
+    ranked AS (
+        SELECT exercise_name, date, weight, {E1RM_SQL} AS e1rm FROM facts
+    ),
+    heaviest AS (
+        SELECT exercise_name, weight, date,
+               ROW_NUMBER() OVER (PARTITION BY exercise_name ORDER BY weight DESC, date) AS n
+        FROM ranked
+    ),
+    strongest AS (
+        SELECT exercise_name, e1rm, date,
+               ROW_NUMBER() OVER (PARTITION BY exercise_name ORDER BY e1rm DESC, date) AS n
+        FROM ranked
+    )
+    INSERT INTO archived_bests AS ab (username, exercise_name, best_weight, best_date, best_e1rm, e1rm_date)
+    SELECT :username, h.exercise_name, h.weight, h.date, s.e1rm, s.date
+    FROM heaviest h
+    JOIN strongest s ON s.exercise_name = h.exercise_name AND s.n = 1
+    WHERE h.n = 1
+    ON CONFLICT (username, exercise_name) DO UPDATE SET
+        best_date = CASE WHEN excluded.best_weight > ab.best_weight THEN excluded.best_date ELSE ab.best_date END,
+        best_weight = CASE WHEN excluded.best_weight > ab.best_weight THEN excluded.best_weight ELSE ab.best_weight END,
+        e1rm_date = CASE WHEN excluded.best_e1rm > ab.best_e1rm THEN excluded.e1rm_date ELSE ab.e1rm_date END,
+        best_e1rm = CASE WHEN excluded.best_e1rm > ab.best_e1rm THEN excluded.best_e1rm ELSE ab.best_e1rm END
+"""
+
+
+def estimated_1rm(weight: float, reps: Optional[int]) -> float:
+    # Epley formula; a single rep is already a 1RM
+    if reps and reps > 1:
+        return weight * (1 + reps / 30.0)
+    return weight
+
+
+def keep_archived(conn: Connection, username: str, before: str) -> None:
+    """Keep the bests of the user's completed workouts dated before ``before``, which are being archived."""
+    conn.execute(ARCHIVE_SQL, {"username": username, "before": before})
+
+
+def recompute(conn: Connection, username: str, exercise_name: str) -> None:
+    conn.execute(
+        "DELETE FROM personal_bests WHERE username = ? AND exercise_name = ?", (username, exercise_name)
+    )
+    conn.execute(RECOMPUTE_SQL, {"username": username, "exercise_name": exercise_name})
+
+
+def record_changes(conn: Connection,
+                   changes: list[tuple[int, Optional[float], Optional[float]]]) -> set[str]:
+    """Fold set changes into ``personal_bests``; call after the sets were written.
+
+    ``changes`` holds ``(exercise_log_id, old_weight, new_weight)``, with None for
+    a set that did not exist before or was deleted. New maxima are merged in
+    place; a change that lowers or removes a set at the current best triggers a
+    recompute of just that exercise. Returns the usernames whose sets changed.
+    """
+    if not changes:
+        return set()
+    exercise_log_ids = list({eid for eid, _, _ in changes})
+    placeholders = ", ".join("?" * len(exercise_log_ids))
+    context = {
+        eid: (username, exercise_name, workout_date, reps)
+        for eid, username, exercise_name, workout_date, reps in conn.execute(f"""
+            SELECT el.id, wl.username, el.exercise_name, wl.date, {PLANNED_REPS_SQL}
+            FROM exercise_logs el
+            JOIN workout_logs wl ON wl.id = el.workout_log_id
+            WHERE el.id IN ({placeholders})
+        """, exercise_log_ids)
+    }
+
+    usernames = {username for username, _, _, _ in context.values()}
+    placeholders = ", ".join("?" * len(usernames))
+    bests = {
+        (username, exercise_name): (best_weight, best_e1rm)
+        for username, exercise_name, best_weight, best_e1rm in conn.execute(f"""
+            SELECT username, exercise_name, best_weight, best_e1rm FROM personal_bests
+            WHERE username IN ({placeholders})
+        """, list(usernames))
+    }
+
+    candidates = {}
+    stale = set()
+    for eid, old_weight, new_weight in changes:
+        username, exercise_name, workout_date, reps = context[eid]
+        key = (username, exercise_name)
+        best_weight, best_e1rm = bests.get(key, (None, None))
+        if old_weight is not None and (new_weight is None or new_weight < old_weight) and best_weight is not None:
+            if old_weight >= best_weight or estimated_1rm(old_weight, reps) >= best_e1rm:
+                stale.add(key)
+        if new_weight is not None:
+            candidates.setdefault(key, []).append((new_weight, workout_date, estimated_1rm(new_weight, reps)))
+
+    for key in stale:
+        recompute(conn, *key)
+
+    merges = []
+    for key, sets in candidates.items():
+        if key in stale:
+            continue
+        # max() keeps the first of equal values, so sort by date to prefer the earliest
+        sets.sort(key=lambda s: s[1])
+        weight, weight_date, _ = max(sets, key=lambda s: s[0])
+        _, e1rm_date, e1rm = max(sets, key=lambda s: s[2])
+        merges.append((*key, weight, weight_date, e1rm, e1rm_date))
+    # Keep the earlier date when a best is only matched, not beaten
+    conn.executemany("""
+        INSERT INTO personal_bests AS pb (username, exercise_name, best_weight, best_date, best_e1rm, e1rm_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (username, exercise_name) DO UPDATE SET
+            best_date = CASE WHEN excluded.best_weight > pb.best_weight THEN excluded.best_date ELSE pb.best_date END,
+            best_weight = CASE WHEN excluded.best_weight > pb.best_weight THEN excluded.best_weight ELSE pb.best_weight END,
+            e1rm_date = CASE WHEN excluded.best_e1rm > pb.best_e1rm THEN excluded.e1rm_date ELSE pb.e1rm_date END,
+            best_e1rm = CASE WHEN excluded.best_e1rm > pb.best_e1rm THEN excluded.best_e1rm ELSE pb.best_e1rm END
+    """, merges)
+    return usernames
+
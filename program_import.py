@@ -0,0 +1,147 @@
+import csv
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from storage import Connection
+
+# "5 x 5", "3x8", "3 X 8-10 reps": sets, then reps (the low end of a range)
+SETS_REPS = re.compile(r"^\s*(\d+)\s*[xX×]\s*(\d+)")
+
+
+class ProgramImportError(ValueError):
+    pass
+
+
+@dataclass
+class ParsedSession:
+    name: str
+    sets: int
+    reps: int
+    exercises: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ImportResult:
+    program: str
+    sessions: int
+    exercises: int
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+def read_rows(path: Path) -> Iterator[list[str]]:
+    """Yield the rows of a CSV or XLSX sheet one at a time, as stripped strings."""
+    if path.suffix.lower() in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ProgramImportError("Reading .xlsx programs requires openpyxl (pip install openpyxl)")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield ["" if cell is None else str(cell).strip() for cell in row]
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.reader(f):
+                yield [cell.strip() for cell in row]
+
+
+def parse_sets_reps(value: str, row_number: int) -> tuple[int, int]:
+    match = SETS_REPS.match(value)
+    if not match:
+        raise ProgramImportError(f"Row {row_number}: can't parse sets x reps from {value!r}")
+    sets, reps = int(match.group(1)), int(match.group(2))
+    if sets < 1 or reps < 1:
+        raise ProgramImportError(f"Row {row_number}: sets and reps must be positive, got {value!r}")
+    return sets, reps
+
+
+def parse_sessions(rows: Iterable[list[str]]) -> Iterator[ParsedSession]:
+    """Detect session blocks in a coach's sheet.
+
+    A session starts at a row with a label in the first column and its sets x
+    reps in the third; the exercises follow with an empty first column and the
+    name in the second. Anything before the first session header (titles,
+    notes) and "DAY" separator rows are skipped, as are headers that never get
+    an exercise. A header that does get exercises must have valid sets x reps.
+    """
+    header: Optional[tuple[int, str]] = None  # (row number, sets x reps) of the pending header
+    current: Optional[ParsedSession] = None
+    index = 0
+    for row_number, row in enumerate(rows, start=1):
+        first = row[0] if row else ""
+        second = row[1] if len(row) > 1 else ""
+        third = row[2] if len(row) > 2 else ""
+        if first.upper() == "DAY":
+            continue
+        if first:
+            if header is None and current is None and not SETS_REPS.match(third):
+                continue  # preamble before the first session
+            if current and current.exercises:
+                yield current
+            header, current = (row_number, third), None
+        elif second and header is not None:
+            if current is None:
+                index += 1
+                header_row, sets_reps = header
+                sets, reps = parse_sets_reps(sets_reps, header_row)
+                current = ParsedSession(f"Session {index}", sets, reps)
+            current.exercises.append(second)
+    if current and current.exercises:
+        yield current
+
+
+def import_program(conn: Connection, name: str, sessions: Iterable[ParsedSession]) -> tuple[int, int]:
+    """Create or replace the named program; returns (sessions, exercises). Run inside a transaction."""
+    sessions = list(sessions)
+    if not sessions:
+        raise ProgramImportError(f"No sessions found for program {name!r}")
+    conn.execute("INSERT INTO programs (name) VALUES (?) ON CONFLICT (name) DO NOTHING", (name,))
+    program_id = conn.execute("SELECT id FROM programs WHERE name = ?", (name,)).fetchone()[0]
+
+    # Replacing the sessions cascades to their exercises; workout logs are untouched
+    conn.execute("DELETE FROM sessions WHERE program_id = ?", (program_id,))
+    conn.executemany(
+        "INSERT INTO sessions (program_id, session_index, name) VALUES (?, ?, ?)",
+        [(program_id, i, session.name) for i, session in enumerate(sessions, start=1)]
+    )
+    session_ids = dict(conn.execute(
+        "SELECT session_index, id FROM sessions WHERE program_id = ?", (program_id,)
+    ).fetchall())
+    exercises = [
+        (session_ids[i], exercise, session.sets, session.reps)
+        for i, session in enumerate(sessions, start=1)
+        for exercise in session.exercises
+    ]
+    conn.executemany(
+        "INSERT INTO session_exercises (session_id, exercise_name, sets, reps) VALUES (?, ?, ?, ?)",
+        exercises
+    )
+    # Running servers reload their program catalog when this changes
+    conn.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+    return len(sessions), len(exercises)
+
+
+def import_file(conn: Connection, path: Path, name: Optional[str] = None) -> ImportResult:
+    """Stream one program file into the database; the program is named after the file by default."""
+    started = time.perf_counter()
+    rows_read = 0
+
+    def counted(rows: Iterable[list[str]]) -> Iterator[list[str]]:
+        nonlocal rows_read
+        for row in rows:
+            rows_read += 1
+            yield row
+
+    name = name or path.stem
+    sessions, exercises = import_program(conn, name, parse_sessions(counted(read_rows(path))))
+    return ImportResult(name, sessions, exercises, rows_read, time.perf_counter() - started)
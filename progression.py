@@ -0,0 +1,61 @@
+from typing import Optional
+
+from catalog import PlannedSession
+from db import Repository
+
+# Added to the lightest working set once every planned set has been logged
+WEIGHT_INCREMENT = 5
+
+# The sets of each exercise's most recent prior log of this session. The
+# window function picks that log for all exercises in one pass over the
+# user's history for the session (idx_workout_logs_user_program_session).
+LAST_LOGGED_SQL = """
+    WITH previous AS (
+        SELECT el.id, el.exercise_name,
+               ROW_NUMBER() OVER (PARTITION BY el.exercise_name ORDER BY wl.date DESC, wl.id DESC) AS recency
+        FROM workout_logs wl
+        JOIN exercise_logs el ON el.workout_log_id = wl.id
+        WHERE wl.username = :username AND wl.program_id = :program_id AND wl.session_index = :session_index
+          AND (CAST(:before_workout_id AS BIGINT) IS NULL OR wl.id < :before_workout_id)
+    )
+    SELECT pr.exercise_name, COUNT(sl.id), MIN(sl.weight)
+    FROM previous pr
+    LEFT JOIN set_logs sl ON sl.exercise_log_id = pr.id
+    WHERE pr.recency = 1
+    GROUP BY pr.exercise_name
+"""
+
+
+def target_weight(sets: int, logged_sets: int, lightest: Optional[float]) -> float:
+    if logged_sets == 0:
+        return 0.0
+    if logged_sets == sets:
+        return lightest + WEIGHT_INCREMENT
+    return lightest
+
+
+def session_targets(repo: Repository, username: str, session: Optional[PlannedSession],
+                    before_workout_id: Optional[int] = None) -> list[tuple[str, int, int, float]]:
+    """Return ``(exercise_name, sets, reps, target_weight)`` for every exercise in the session.
+
+    The plan comes from the program catalog; only the user's last logged sets
+    are queried. ``before_workout_id`` ignores that workout and anything
+    logged after it, so a resumed workout does not progress from its own sets.
+    """
+    if session is None:
+        return []
+    with repo.connection() as conn:
+        last_logged = {
+            exercise_name: (logged_sets, lightest)
+            for exercise_name, logged_sets, lightest in conn.execute(LAST_LOGGED_SQL, {
+                "username": username,
+                "program_id": repo.program_id,
+                "session_index": session.index,
+                "before_workout_id": before_workout_id,
+            })
+        }
+    targets = []
+    for exercise in session.exercises:
+        logged_sets, lightest = last_logged.get(exercise.name, (0, None))
+        targets.append((exercise.name, exercise.sets, exercise.reps, target_weight(exercise.sets, logged_sets, lightest)))
+    return targets
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_TTL = 300.0
+
+
+class QueryCache:
+    """Per-user LRU cache of read query results with a TTL.
+
+    Entries are keyed on ``(username, query name, args, data version)``. Write
+    paths call ``bump`` for the users they touched, which moves those users to a
+    new version (so their old entries can never be hit again) and drops them.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, username: str) -> int:
+        return self._versions.get(username, 0)
+
+    def bump(self, username: str) -> None:
+        with self._lock:
+            self._versions[username] = self._versions.get(username, 0) + 1
+            for key in [key for key in self._entries if key[0] == username]:
+                del self._entries[key]
+
+    def get_or_load(self, username: str, name: str, args: tuple[Hashable, ...],
+                    loader: Callable[[], Any]) -> Any:
+        key = (username, name, args, self.version(username))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Loaded outside the lock; a write that lands meanwhile bumps the version,
+        # so this result is stored under a key that will not be read again
+        value = loader()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,107 @@
+import argparse
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from db import Repository
+
+# Completed workouts older than this keep per-exercise summaries instead of their sets
+KEEP_DAYS = 730
+
+# One row per (workout, exercise) of the compacted workouts' completed sets. A rerun
+# after sets were restored into an already compacted workout adds to its summary.
+SUMMARIZE_SQL = """
+    INSERT INTO workout_summaries AS ws (workout_log_id, exercise_name, sets, top_weight, total_weight)
+    SELECT el.workout_log_id, el.exercise_name, COUNT(*), MAX(sl.weight), SUM(sl.weight)
+    FROM workout_logs wl
+    JOIN exercise_logs el ON el.workout_log_id = wl.id
+    JOIN set_logs sl ON sl.exercise_log_id = el.id
+    WHERE wl.username = :username AND wl.status = 'completed' AND wl.date < :before AND sl.completed
+    GROUP BY el.workout_log_id, el.exercise_name
+    ON CONFLICT (workout_log_id, exercise_name) DO UPDATE SET
+        sets = ws.sets + excluded.sets,
+        top_weight = CASE WHEN excluded.top_weight > ws.top_weight THEN excluded.top_weight ELSE ws.top_weight END,
+        total_weight = ws.total_weight + excluded.total_weight
+"""
+
+
+@dataclass(frozen=True)
+class CompactionSummary:
+    username: str
+    workouts: int
+    sets: int
+
+
+def cutoff(keep_days: int = KEEP_DAYS) -> str:
+    return (date.today() - timedelta(days=keep_days)).isoformat()
+
+
+def compact_user(repo: Repository, username: str, before: str) -> CompactionSummary:
+    """Roll the user's completed workouts dated before ``before`` up into ``workout_summaries``.
+
+    The workouts themselves stay, so the session rotation, progress charts and
+    personal bests are unchanged; their exercise and set rows are deleted. The
+    history screen only lists workouts that still have sets.
+    """
+    params = {"username": username, "before": before}
+    with repo.transaction(immediate=True) as conn:
+        workouts, sets = conn.execute("""
+            SELECT COUNT(DISTINCT wl.id), COUNT(sl.id)
+            FROM workout_logs wl
+            JOIN exercise_logs el ON el.workout_log_id = wl.id
+            LEFT JOIN set_logs sl ON sl.exercise_log_id = el.id
+            WHERE wl.username = :username AND wl.status = 'completed' AND wl.date < :before
+        """, params).fetchone()
+        if workouts:
+            conn.execute(SUMMARIZE_SQL, params)
+            # set_logs go with their exercise logs (ON DELETE CASCADE)
+            conn.execute("""
+                DELETE FROM exercise_logs WHERE workout_log_id IN (
+                    SELECT id FROM workout_logs
+                    WHERE username = :username AND status = 'completed' AND date < :before
+                )
+            """, params)
+    if workouts:
+        repo.query_cache.bump(username)
+    return CompactionSummary(username, workouts, sets)
+
+
+def compact(repo: Repository, before: str) -> list[CompactionSummary]:
+    # One transaction per user keeps each write lock short
+    with repo.connection() as conn:
+        users = [row[0] for row in conn.execute("SELECT DISTINCT username FROM workout_logs ORDER BY username")]
+    return [compact_user(repo, username, before) for username in users]
+
+
+def main() -> None:
+    import tenancy
+
+    parser = argparse.ArgumentParser(
+        description="Compact old workouts into per-exercise summaries and vacuum the databases."
+    )
+    parser.add_argument("--db", default="workouts.db",
+                        help="SQLite path or postgresql:// URL (default: workouts.db)")
+    parser.add_argument("--shards", help="also compact every shard database in this directory (see tenancy.py)")
+    parser.add_argument("--keep-days", type=int, default=KEEP_DAYS,
+                        help=f"keep set-level detail for this many days (default: {KEEP_DAYS})")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip reclaiming the freed space")
+    args = parser.parse_args()
+
+    before = cutoff(args.keep_days)
+    databases = [args.db] + [str(path) for path in tenancy.shard_paths(args.shards)] if args.shards else [args.db]
+    for database in databases:
+        repo = Repository(database)
+        try:
+            summaries = [summary for summary in compact(repo, before) if summary.workouts]
+            for summary in summaries:
+                print(f"✅ {database} {summary.username}: {summary.workouts} workouts, "
+                      f"{summary.sets} sets compacted")
+            if not args.no_vacuum:
+                repo.backend.vacuum()
+            if not summaries:
+                print(f"– {database}: nothing before {before}")
+        finally:
+            repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import streamlit as st
+
+from ui import get_repository
+
+repo = get_repository()
+username = st.session_state["username"]
+
+st.subheader("🏆 Personal Bests (5x5)")
+metric = st.radio("Rank by", ["Heaviest set", "Estimated 1RM"], horizontal=True, key="bests_metric")
+bests = repo.cached(username, repo.personal_bests, username)
+# Strongest first by the chosen metric; ties stay alphabetical
+bests = sorted(bests, key=lambda best: -(best[1] if metric == "Heaviest set" else best[3]))
+if bests:
+    for ex, w, w_date, e1rm, e1rm_date in bests:
+        if metric == "Heaviest set":
+            st.write(f"- **{ex}**: {w} lbs ({w_date})")
+        else:
+            st.write(f"- **{ex}**: {e1rm:.1f} lbs est. 1RM ({e1rm_date})")
+else:
+    st.info("No personal bests yet. Start your first session!")
@@ -0,0 +1,131 @@
+import io
+
+import streamlit as st
+
+import history_editor
+import training_log
+from ui import get_plans, get_repository, page_state
+
+HISTORY_PAGE_SIZES = [10, 25, 50]
+
+repo = get_repository()
+plans = get_plans()
+username = st.session_state["username"]
+state = page_state("history")
+
+st.subheader("📅 Workout History")
+
+# Filters and page size; changing any of them starts again from the newest workout
+col1, col2, col3 = st.columns(3)
+with col1:
+    start_date = st.date_input("From", value=None, key="history_from")
+with col2:
+    end_date = st.date_input("To", value=None, key="history_to")
+with col3:
+    page_size = st.selectbox("Per page", HISTORY_PAGE_SIZES, key="history_page_size")
+
+filters = (start_date, end_date, page_size)
+if state.get("filters") != filters:
+    state["filters"] = filters
+    state["cursors"] = [None]
+cursors = state["cursors"]
+
+# Keyset pagination: each page starts after the (date, id) of the previous page's last workout
+workouts, has_more = repo.cached(
+    username, repo.workout_page, username, page_size, cursors[-1],
+    str(start_date) if start_date else None,
+    str(end_date) if end_date else None,
+)
+
+if not workouts:
+    st.info("No workout history yet.")
+else:
+    titles = []
+    for workout_id, workout_date, session, program_id in workouts:
+        # Titles show the planned sets x reps of the session's first exercise
+        workout_program = plans.program(program_id)
+        planned = workout_program.session(session) if workout_program else None
+        if planned and planned.exercises:
+            title = f"{workout_date} - Session {session} ({planned.exercises[0].sets}x{planned.exercises[0].reps})"
+        else:
+            title = f"{workout_date} - Session {session}"
+        titles.append((workout_id, title))
+
+    # One grid for the whole page: every set of every workout, loaded in a single query
+    page = history_editor.build_page(
+        titles, repo.cached(username, repo.page_sets, tuple(workout_id for workout_id, _ in titles))
+    )
+    exercises = sorted({exercise for _, exercise in page.exercise_logs})
+    # A new key after each save, so the grid restarts from the saved rows
+    editor_key = f"history_editor_{cursors[-1]}_{state.get('saves', 0)}"
+    edited = st.data_editor(
+        page.frame,
+        key=editor_key,
+        num_rows="dynamic",
+        hide_index=True,
+        column_order=["Workout", "Exercise", "Set", "Weight"],
+        column_config={
+            "Workout": st.column_config.SelectboxColumn(options=[title for _, title in titles], required=True),
+            "Exercise": st.column_config.SelectboxColumn(options=exercises, required=True),
+            "Set": st.column_config.NumberColumn(min_value=1, step=1, format="%d",
+                                                 help="Leave empty on a new row to add it after the last set"),
+            "Weight": st.column_config.NumberColumn("Weight (lbs)", min_value=0.0, step=2.5, required=True),
+        },
+    )
+
+    if st.button("💾 Save Changes", key="history_save"):
+        edits, errors = history_editor.diff_page(page, edited)
+        if errors:
+            st.error("Nothing was saved; fix these cells first:\n\n"
+                     + "\n".join(f"- {error}" for error in errors))
+        elif not edits:
+            st.info("No changes to save.")
+        else:
+            repo.apply_set_edits(edits.inserts, edits.updates, edits.deletes)
+            state["saves"] = state.get("saves", 0) + 1
+            state["saved"] = (
+                f"✅ Saved {len(edits.inserts)} added, {len(edits.updates)} changed "
+                f"and {len(edits.deletes)} deleted sets"
+            )
+            st.rerun()
+    if "saved" in state:
+        st.success(state.pop("saved"))
+
+col1, col2 = st.columns(2)
+with col1:
+    if len(cursors) > 1 and st.button("⬅️ Newer", key="history_newer"):
+        cursors.pop()
+        st.rerun()
+with col2:
+    if has_more and st.button("Older ➡️", key="history_older"):
+        last_workout = workouts[-1]
+        cursors.append((last_workout[1], last_workout[0]))
+        st.rerun()
+
+# Cold history lives in per-user archive files, only read when asked for
+archives = training_log.archive_files(username, st.secrets.get("archive_dir", training_log.ARCHIVE_DIR))
+if archives and st.toggle("🗄️ Archived history", key="history_archive_open"):
+    archive = st.selectbox("Archive", archives, format_func=lambda path: path.name, key="history_archive")
+    st.dataframe(repo.cached(username, training_log.read_archive, archive), hide_index=True)
+
+if not st.toggle("💾 Backup & restore", key="history_backup_open"):
+    state.pop("export", None)
+else:
+    fmt = training_log.default_format()
+
+    # The export only runs when asked for, and is kept until the panel is closed
+    if st.button("📦 Prepare export", key="history_export_prepare"):
+        out = io.BytesIO()
+        training_log.export_user(repo, username, out, fmt)
+        state["export"] = out.getvalue()
+    if "export" in state:
+        st.download_button("⬇️ Export my training log", data=state["export"],
+                           file_name=f"{username}-training-log{training_log.suffix(fmt)}")
+    upload = st.file_uploader("Restore from an export", type=["parquet", "gz"], key="history_restore")
+    if upload is not None and st.button("⬆️ Import", key="history_import"):
+        try:
+            summary = training_log.import_log(repo, upload, username)
+        except training_log.TrainingLogError as e:
+            st.error(f"❌ {e}")
+        else:
+            st.success(f"✅ Imported {summary.workouts} workouts and {summary.sets} sets")
@@ -0,0 +1,61 @@
+from datetime import date
+
+import streamlit as st
+
+from progression import session_targets
+from ui import get_plans, get_repository, page_state, start_workout
+
+repo = get_repository()
+program = get_plans().program(repo.program_id)
+username = st.session_state["username"]
+state = page_state("home")
+
+st.title("🏠 Home")
+st.markdown(f"Welcome back, **{st.session_state['name']}**!")
+
+if st.session_state.get("active_workout"):
+    st.info(f"Session {st.session_state['active_workout']['session_index']} is in progress.")
+    st.page_link("screens/workout.py", label="Continue logging", icon="🏋️")
+    st.stop()
+
+# === RESUME INCOMPLETE WORKOUT
+resume = repo.cached(username, repo.find_incomplete_workout, username)
+
+if resume:
+    st.subheader("⏳ Incomplete Workout")
+    workout_log_id, session_index = resume
+    if st.button(f"🔄 Resume Incomplete Session (Session {session_index})"):
+        exercise_log_ids = repo.exercise_log_ids(workout_log_id)
+
+        exercises = [
+            (exercise_name, sets, reps, target_weight if exercise_name.strip() in exercise_log_ids else 0.0)
+            for exercise_name, sets, reps, target_weight in session_targets(
+                repo, username, program and program.session(session_index),
+                before_workout_id=workout_log_id
+            )
+        ]
+        start_workout(session_index, workout_log_id, exercise_log_ids, exercises)
+
+# === PREVIEW NEXT SESSION
+if program is None:
+    st.warning("No program loaded yet; import one with seed_db.py.")
+elif st.button("📋 Preview Next Session"):
+    next_session_index = program.next_session(repo.cached(username, repo.last_session_index, username))
+    state["preview"] = (
+        next_session_index,
+        repo.cached(username, session_targets, repo, username, program.session(next_session_index)),
+    )
+
+if "preview" in state:
+    session_index, exercises = state["preview"]
+    st.subheader(f"Session {session_index}")
+    for ex, s, r, w in exercises:
+        st.write(f"• **{ex}** — {s}x{r}, target: {w} lbs")
+
+    if st.button("✅ Begin This Workout"):
+        # Create workout log and exercise logs, keeping their IDs
+        workout_log_id, exercise_log_ids = repo.create_workout(
+            username, session_index, [(ex[0], ex[1]) for ex in exercises], str(date.today())
+        )
+        del state["preview"]
+        start_workout(session_index, workout_log_id, exercise_log_ids, exercises)
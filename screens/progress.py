@@ -0,0 +1,31 @@
+import streamlit as st
+
+import analytics
+from ui import get_plans, get_repository
+
+repo = get_repository()
+username = st.session_state["username"]
+
+st.subheader("📈 Progress")
+# Computed once per data version from the user's whole history
+report = repo.cached(username, analytics.progress_report, repo, get_plans(), username)
+if report is None:
+    st.info("No workout history yet. Start your first session!")
+else:
+    exercises = list(report.top_sets.columns)
+    selected = st.multiselect("Exercises", exercises, default=exercises[:3], key="progress_exercises")
+    if selected:
+        st.markdown("**Top set per session (lbs)**")
+        st.line_chart(report.top_sets[selected])
+        st.markdown(f"**Estimated 1RM, {analytics.ROLLING_SESSIONS}-session average (lbs)**")
+        st.line_chart(report.e1rm_trend[selected])
+
+    st.markdown("**Weekly tonnage (sets × reps × weight)**")
+    st.bar_chart(report.weekly_tonnage)
+
+    plateaued = report.plateaus[report.plateaus["plateaued"]]
+    for exercise, row in plateaued.iterrows():
+        st.warning(
+            f"⏸️ **{exercise}** hasn't beaten {row['best']:g} lbs in "
+            f"{row['sessions_since_best']} sessions"
+        )
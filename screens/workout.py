@@ -0,0 +1,121 @@
+import time
+
+import streamlit as st
+
+from set_buffer import SetLogBuffer
+from ui import get_repository, get_writer, page_state, profile_fragment
+
+FINISH_WAIT_SECONDS = 10.0
+FLUSH_STATUS_SECONDS = 1.0
+
+repo = get_repository()
+writer = get_writer()
+username = st.session_state["username"]
+workout = st.session_state.get("active_workout")
+state = page_state("workout")
+
+if not workout:
+    st.info("No workout in progress.")
+    st.page_link("screens/home.py", label="Preview your next session", icon="📋")
+    st.stop()
+
+st.subheader(f"Logging: Session {workout['session_index']}")
+
+# Load every set of this workout once; edits are queued for the background writer
+workout_log_id = workout["workout_log_id"]
+buffer = st.session_state.get("set_buffer")
+if buffer is None or buffer.workout_log_id != workout_log_id:
+    buffer = SetLogBuffer(repo, writer, username, workout_log_id, workout["exercise_log_ids"].values())
+    st.session_state["set_buffer"] = buffer
+
+
+@st.fragment(run_every=FLUSH_STATUS_SECONDS)
+def render_flush_status():
+    status = writer.status(username)
+    if status.failed:
+        st.error(f"⚠️ {status.failed} set(s) not saved. {status.error}")
+        if st.button("🔁 Retry saving", key="retry_failed_sets"):
+            writer.retry(username)
+    elif status.retries:
+        st.caption(f"⏳ Database busy, retrying ({status.retries})… {status.pending} set(s) waiting")
+    elif status.pending:
+        st.caption(f"💾 Saving {status.pending} set(s)…")
+    elif status.flushed_at:
+        st.caption(f"✅ All sets saved ({time.time() - status.flushed_at:.0f}s ago)")
+
+
+@st.fragment
+def render_exercise(exercise_name: str, sets: int, reps: int, target_weight: float):
+    # Logging a set reruns only this exercise, not the page
+    profile_fragment("log_set")
+    st.markdown(f"### {exercise_name} — {sets} sets x {reps} reps")
+
+    if target_weight > 0:
+        st.markdown(f"➡️ **Target:** {target_weight} lbs")
+        if target_weight % 5 == 0:
+            st.caption(f"💪 Weight increased to {target_weight}")
+        else:
+            st.caption(f"🔁 Let’s try {target_weight} again")
+    else:
+        st.caption("🎯 New exercise — pick your starting weight!")
+
+    exercise_log_id = workout["exercise_log_ids"][exercise_name]
+
+    for set_num in range(1, sets + 1):
+        # Look up existing value first
+        saved_weight = buffer.get(exercise_log_id, set_num)
+
+        # Show input with previously saved weight
+        weight = st.number_input(
+            f"Set {set_num} weight (lbs)",
+            min_value=0.0,
+            value=saved_weight if saved_weight is not None else 0.0,
+            step=1.0,
+            key=f"set_{workout_log_id}_{exercise_name}_{set_num}"
+        )
+
+        # Save only if it's changed or not saved yet
+        if weight > 0.0 and saved_weight != weight:
+            buffer.set(exercise_log_id, set_num, weight)
+
+
+render_flush_status()
+for exercise in workout["exercises"]:
+    render_exercise(*exercise)
+
+# Don't show the "Finish Workout" button if we're in confirmation mode
+if not state.get("confirm_finish"):
+    if st.button("✅ Finish Workout", key="finish_workout_btn"):
+        state["incomplete"] = [
+            (exercise_name, count, sets)
+            for exercise_name, sets, _, _ in workout["exercises"]
+            if (count := buffer.count(workout["exercise_log_ids"][exercise_name])) < sets
+        ]
+        # Set flag to enter confirmation step
+        state["confirm_finish"] = True
+        st.rerun()  # 🔁 force rerender to cleanly hide the button
+
+# Confirmation section
+if state.get("confirm_finish"):
+    if state["incomplete"]:
+        st.warning("⚠️ Not all sets are filled in:")
+        for ex, logged, total in state["incomplete"]:
+            st.write(f"- {ex}: {logged} of {total} sets completed")
+
+    if st.button("✅✅ Confirm Finished", key="confirm_finish"):
+        # Finishing is only recorded once every logged set has been written
+        if not buffer.flush(FINISH_WAIT_SECONDS):
+            if writer.status(username).failed:
+                st.error("Some sets could not be saved. Retry saving them above, then finish again.")
+            else:
+                st.error("Still saving your sets — the database is busy. Please try again.")
+        else:
+            repo.finish_workout(username, workout_log_id)
+            st.session_state.pop("set_buffer", None)
+            st.session_state.pop("active_workout", None)
+            state.clear()
+            st.switch_page("screens/home.py")
+
+    if st.button("⬅️ Cancel", key="cancel_finish"):
+        state.clear()
+        st.rerun()  # 🔁 bring back the finish button
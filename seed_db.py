@@ -1,106 +1,36 @@
-import sqlite3
-import pandas as pd
-
-# === Load your CSV ===
-df = pd.read_csv("Workout - Sheet1.csv", header=None)
-workout_data = df.iloc[4:113].reset_index(drop=True)
-
-# === Parse sessions and exercises ===
-sessions = []
-current_session = {"name": None, "sets_reps": None, "exercises": []}
-
-for _, row in workout_data.iterrows():
-    if isinstance(row[0], str) and row[0].strip().upper() == "DAY":
-        continue
-    elif pd.notna(row[0]):
-        if current_session["name"] and current_session["exercises"]:
-            sessions.append(current_session)
-        current_session = {
-            "name": f"Session {len(sessions) + 1}",
-            "sets_reps": row[2],
-            "exercises": []
-        }
-    elif pd.isna(row[0]) and pd.notna(row[1]):
-        current_session["exercises"].append(row[1])
-
-if current_session["name"] and current_session["exercises"]:
-    sessions.append(current_session)
-
-# === Create DB and tables ===
-conn = sqlite3.connect("workouts.db")
-c = conn.cursor()
-
-c.execute("DROP TABLE IF EXISTS set_logs")
-c.execute("DROP TABLE IF EXISTS exercise_logs")
-c.execute("DROP TABLE IF EXISTS workout_logs")
-c.execute("DROP TABLE IF EXISTS session_exercises")
-c.execute("DROP TABLE IF EXISTS sessions")
-
-c.execute('''
-CREATE TABLE sessions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    session_index INTEGER UNIQUE,
-    name TEXT
-)
-''')
-
-c.execute('''
-CREATE TABLE session_exercises (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    session_id INTEGER,
-    exercise_name TEXT,
-    sets INTEGER,
-    reps INTEGER,
-    FOREIGN KEY (session_id) REFERENCES sessions(id)
-)
-''')
-
-c.execute('''
-CREATE TABLE workout_logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    session_index INTEGER,
-    username TEXT,
-    date TEXT
-)
-''')
-
-c.execute('''
-CREATE TABLE exercise_logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    workout_log_id INTEGER,
-    exercise_name TEXT,
-    FOREIGN KEY (workout_log_id) REFERENCES workout_logs(id)
-)
-''')
-
-c.execute('''
-CREATE TABLE set_logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    exercise_log_id INTEGER,
-    set_number INTEGER,
-    weight REAL,
-    completed BOOLEAN,
-    FOREIGN KEY (exercise_log_id) REFERENCES exercise_logs(id)
-)
-''')
-
-# === Seed 12 sessions and their exercises ===
-for i, session in enumerate(sessions, start=1):
-    c.execute("INSERT INTO sessions (session_index, name) VALUES (?, ?)", (i, session["name"]))
-    session_id = c.lastrowid
-
+import argparse
+import sys
+from pathlib import Path
+
+from db import Repository
+from program_import import ProgramImportError, import_file
+
+parser = argparse.ArgumentParser(description="Load coach-authored programs (CSV or XLSX) into the workout database.")
+parser.add_argument("files", nargs="*", type=Path, default=[Path("Workout - Sheet1.csv")],
+                    help="program files to import; each becomes (or replaces) one program")
+parser.add_argument("--program", help="program name when importing a single file (default: the file name)")
+parser.add_argument("--db", default="workouts.db",
+                    help="SQLite path or postgresql:// URL (default: workouts.db)")
+args = parser.parse_args()
+
+if args.program and len(args.files) > 1:
+    parser.error("--program can only be used with a single file")
+
+# === Open DB and bring the schema up to date (never drops workout history) ===
+repo = Repository(args.db, pool_size=1)
+
+# === Import each program in its own transaction ===
+failed = False
+for path in args.files:
     try:
-        sets, reps = [int(s.strip().split()[0]) for s in session["sets_reps"].split("x")]
-    except:
-        sets, reps = 5, 5  # fallback
-
-    for exercise in session["exercises"]:
-        c.execute("""
-            INSERT INTO session_exercises (session_id, exercise_name, sets, reps)
-            VALUES (?, ?, ?, ?)
-        """, (session_id, exercise, sets, reps))
-
-conn.commit()
-conn.close()
+        with repo.transaction() as conn:
+            result = import_file(conn, path, args.program)
+    except (OSError, ProgramImportError) as e:
+        print(f"❌ {path}: {e}", file=sys.stderr)
+        failed = True
+        continue
+    print(f"✅ {result.program}: {result.sessions} sessions, {result.exercises} exercises "
+          f"({result.rows} rows in {result.seconds:.2f}s, {result.rows_per_second:,.0f} rows/sec)")
 
-print("✅ Database seeded successfully!")
+repo.close()
+sys.exit(1 if failed else 0)
@@ -0,0 +1,43 @@
+from typing import Iterable, Optional
+
+from db import Repository
+from set_writer import SetWriter
+
+
+class SetLogBuffer:
+    """One workout's set weights as the logging user sees them, kept in session state.
+
+    All ``set_logs`` rows for the workout are loaded in a single query, with the
+    user's writes still queued in the ``SetWriter`` laid on top. Edits from the
+    number inputs update the buffer and are handed to the writer, so a rerun
+    never waits on the database.
+    """
+
+    def __init__(self, repo: Repository, writer: SetWriter, username: str, workout_log_id: int,
+                 exercise_log_ids: Iterable[int]):
+        self.writer = writer
+        self.username = username
+        self.workout_log_id = workout_log_id
+        exercise_log_ids = list(exercise_log_ids)
+        self.weights: dict[tuple[int, int], float] = repo.get_set_logs(exercise_log_ids)
+        self.weights.update(
+            (key, weight) for key, weight in writer.pending(username).items() if key[0] in exercise_log_ids
+        )
+
+    def get(self, exercise_log_id: int, set_number: int) -> Optional[float]:
+        return self.weights.get((exercise_log_id, set_number))
+
+    def set(self, exercise_log_id: int, set_number: int, weight: float) -> None:
+        key = (exercise_log_id, set_number)
+        if self.weights.get(key) != weight:
+            self.weights[key] = weight
+            self.writer.submit(self.username, [(exercise_log_id, set_number, weight)])
+
+    def count(self, exercise_log_id: int) -> int:
+        # Sets the writer could not save are not logged
+        failed = self.writer.failed(self.username)
+        return sum(1 for key in self.weights if key[0] == exercise_log_id and key not in failed)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for this user's queued writes to commit; False if ``timeout`` ran out first."""
+        return self.writer.wait(self.username, timeout)
@@ -0,0 +1,206 @@
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from db import Repository
+
+logger = logging.getLogger("workout_tracker.writes")
+
+# Milliseconds the writer keeps collecting submissions after the first one, so
+# rapid edits from every session land in one transaction
+GROUP_COMMIT_MS = 50
+# Lock contention is retried with exponential backoff, starting here and capped below
+RETRY_BACKOFF = 0.05
+MAX_BACKOFF = 2.0
+# After this long the sets count as failed, so a long-held lock cannot stall every user
+RETRY_SECONDS = 30.0
+
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class FlushStatus:
+    pending: int
+    retries: int
+    failed: int                  # sets whose write failed; they stay unsaved until retried
+    error: Optional[str]         # why the latest of them failed
+    flushed_at: Optional[float]  # time.time() of the user's last committed batch
+
+
+class SetWriter:
+    """Per-process background writer for set weights logged from the active workout.
+
+    Sessions ``submit`` and return straight away; one daemon thread group-commits
+    the queue through ``Repository.upsert_sets``, one transaction per database
+    (``repository_for`` maps a username to its repository, see tenancy.py).
+    Submitted weights stay in an in-memory overlay until committed, so the
+    submitting user reads their own writes (``pending``) before they reach the database.
+    A set that cannot be written, including one still locked out after
+    ``retry_seconds``, is kept as ``failed`` until it is resubmitted (``retry``)
+    or overwritten; until then ``wait`` reports False.
+    """
+
+    def __init__(self, repository_for: Callable[[str], Repository], group_commit_ms: float = GROUP_COMMIT_MS,
+                 retry_seconds: float = RETRY_SECONDS):
+        self.repository_for = repository_for
+        self.group_commit = group_commit_ms / 1000
+        self.retry_seconds = retry_seconds
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Condition()
+        # username -> {(exercise_log_id, set_number): (sequence, weight)}
+        self._overlay: dict[str, dict[tuple[int, int], tuple[int, float]]] = {}
+        self._sequence = 0
+        self._retries: dict[str, int] = {}
+        # username -> {(exercise_log_id, set_number): (weight, error)}
+        self._failed: dict[str, dict[tuple[int, int], tuple[float, str]]] = {}
+        self._flushed_at: dict[str, float] = {}
+        self._thread = threading.Thread(target=self._run, name="set-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, username: str, sets: list[tuple[int, int, float]]) -> None:
+        """Queue ``(exercise_log_id, set_number, weight)`` writes without waiting for them."""
+        with self._lock:
+            overlay = self._overlay.setdefault(username, {})
+            failed = self._failed.get(username, {})
+            for exercise_log_id, set_number, weight in sets:
+                # A newer weight replaces a failed one; it fails again on its own if need be
+                failed.pop((exercise_log_id, set_number), None)
+                self._sequence += 1
+                overlay[(exercise_log_id, set_number)] = (self._sequence, weight)
+                self._queue.put((username, exercise_log_id, set_number, self._sequence, weight))
+
+    def pending(self, username: str) -> dict[tuple[int, int], float]:
+        with self._lock:
+            return {key: weight for key, (_, weight) in self._overlay.get(username, {}).items()}
+
+    def failed(self, username: str) -> dict[tuple[int, int], float]:
+        with self._lock:
+            return {key: weight for key, (weight, _) in self._failed.get(username, {}).items()}
+
+    def retry(self, username: str) -> None:
+        """Resubmit the user's failed sets."""
+        sets = [(eid, set_number, weight) for (eid, set_number), weight in self.failed(username).items()]
+        self.submit(username, sets)
+
+    def status(self, username: str) -> FlushStatus:
+        with self._lock:
+            failed = self._failed.get(username, {})
+            return FlushStatus(
+                len(self._overlay.get(username, ())), self._retries.get(username, 0), len(failed),
+                next(reversed(failed.values()))[1] if failed else None, self._flushed_at.get(username),
+            )
+
+    def wait(self, username: str, timeout: Optional[float] = None) -> bool:
+        """Block until the user's submitted sets are written.
+
+        False on timeout, or when any of the user's sets failed and were not retried.
+        """
+        with self._lock:
+            return (self._lock.wait_for(lambda: not self._overlay.get(username), timeout)
+                    and not self._failed.get(username))
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        # Writes already queued are committed before the thread exits
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # === Writer thread
+
+    def _collect(self) -> tuple[list, bool]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.group_commit
+        while batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        stop = batch[-1] is _STOP
+        return [item for item in batch if item is not _STOP], stop
+
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: list) -> None:
+        # The latest submission of each set wins. Ids are only unique within one
+        # database, so sets are keyed by user as well.
+        latest = {(username, eid, set_number): (sequence, weight)
+                  for username, eid, set_number, sequence, weight in batch}
+        usernames = {username for username, _, _ in latest}
+        errors: dict[tuple[str, int, int], str] = {}
+        repos: dict[str, Repository] = {}
+        for username in usernames:
+            try:
+                repos[username] = self.repository_for(username)
+            except Exception as e:
+                # E.g. the user's shard cannot be opened; their sets fail like any other write
+                logger.exception("Could not open the database of %s", username)
+                errors.update(((username, eid, set_number), f"Set weights could not be saved: {e}")
+                              for user, eid, set_number in latest if user == username)
+        by_repo: dict[Repository, list[tuple[str, int, int, float]]] = {}
+        for (username, eid, set_number), (_, weight) in latest.items():
+            if username in repos:
+                by_repo.setdefault(repos[username], []).append((username, eid, set_number, weight))
+
+        for repo, rows in by_repo.items():
+            sets = [(eid, set_number, weight) for _, eid, set_number, weight in rows]
+            error, busy = self._write(repo, sets, {username for username, *_ in rows})
+            if error is None:
+                continue
+            # Retry one by one so a single bad set (e.g. its workout was deleted
+            # meanwhile) does not take the rest of the batch down with it. Past the
+            # retry limit they would only wait for the same lock again.
+            for username, eid, set_number, weight in rows:
+                if not busy:
+                    error, busy = self._write(repo, [(eid, set_number, weight)], {username})
+                if error is not None:
+                    errors[(username, eid, set_number)] = error
+
+        with self._lock:
+            for (username, eid, set_number), (sequence, weight) in latest.items():
+                overlay = self._overlay.get(username, {})
+                # A newer submission of the same set is still queued; keep showing it
+                if overlay.get((eid, set_number), (0,))[0] <= sequence:
+                    overlay.pop((eid, set_number), None)
+                    if (username, eid, set_number) in errors:
+                        failed = self._failed.setdefault(username, {})
+                        failed[(eid, set_number)] = (weight, errors[(username, eid, set_number)])
+            for username in usernames:
+                self._retries.pop(username, None)
+                if not any(key[0] == username for key in errors):
+                    self._flushed_at[username] = time.time()
+            self._lock.notify_all()
+
+    def _write(self, repo: Repository, sets: list[tuple[int, int, float]],
+               usernames: set[str]) -> tuple[Optional[str], bool]:
+        # Lock contention is retried for up to retry_seconds. Returns the error, if
+        # any, and whether it was contention that outlasted the retries.
+        backoff, attempt = RETRY_BACKOFF, 0
+        deadline = time.monotonic() + self.retry_seconds
+        while True:
+            try:
+                repo.upsert_sets(sets)
+                return None, False
+            except Exception as e:
+                if not repo.backend.is_contention(e):
+                    logger.exception("Could not save %d set(s)", len(sets))
+                    return f"Set weights could not be saved: {e}", False
+                if time.monotonic() >= deadline:
+                    logger.warning("Gave up saving %d set(s) after %d attempts: %s", len(sets), attempt + 1, e)
+                    return f"The database stayed busy for {self.retry_seconds:.0f}s; set weights were not saved", True
+            attempt += 1
+            with self._lock:
+                for username in usernames:
+                    self._retries[username] = attempt
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
@@ -0,0 +1,291 @@
+import itertools
+import queue
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, ContextManager, Iterator, Protocol
+
+import migrations
+from instrumentation import QueryStat, TracedConnection, TracedCursorProxy
+
+# Applied to every pooled SQLite connection. WAL lets readers run alongside the
+# single writer, and synchronous=NORMAL skips the fsync on every commit (still safe in WAL).
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+POSTGRES_SCHEMES = ("postgres://", "postgresql://")
+# serialization_failure, deadlock_detected, lock_not_available
+POSTGRES_CONTENTION = ("40001", "40P01", "55P03")
+# Server-side cursors need a name unique within their connection
+_stream_ids = itertools.count()
+
+
+class Connection(Protocol):
+    """The slice of sqlite3.Connection that queries are written against."""
+
+    def execute(self, sql: str, parameters: Any = ()) -> Any: ...
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> Any: ...
+
+    def commit(self) -> None: ...
+
+    def rollback(self) -> None: ...
+
+
+class Backend(ABC):
+    """Where a Repository gets pooled connections from, plus the few dialect-specific operations.
+
+    Queries are written once, in SQL both SQLite and PostgreSQL accept, with
+    sqlite3 placeholders (``?`` and ``:name``).
+    """
+
+    dialect = ""
+
+    @abstractmethod
+    def connection(self) -> ContextManager[Connection]:
+        ...
+
+    @abstractmethod
+    def begin_write(self, conn: Connection) -> None:
+        """Start a transaction that reads and then writes without racing other writers."""
+
+    @abstractmethod
+    def migrate(self, conn: Connection) -> None:
+        ...
+
+    @abstractmethod
+    def next_ids(self, conn: Connection, table: str, count: int) -> list[int]:
+        """Reserve ``count`` fresh ids of ``table`` for rows inserted with explicit ids."""
+
+    @abstractmethod
+    def stream(self, conn: Connection, sql: str, parameters: Any, size: int) -> Iterator[list[tuple]]:
+        """The query's rows in chunks of ``size``, without holding the whole result in memory."""
+
+    @abstractmethod
+    def is_contention(self, error: Exception) -> bool:
+        """Whether ``error`` means another writer got in the way, so a retry can succeed."""
+
+    @abstractmethod
+    def is_invalid_data(self, error: Exception) -> bool:
+        """Whether ``error`` means the rows written break a constraint or column type."""
+
+    @abstractmethod
+    def explain(self, conn: Connection, stat: QueryStat) -> list[str]:
+        ...
+
+    @abstractmethod
+    def vacuum(self) -> None:
+        """Give the space of deleted rows back and refresh planner statistics."""
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class SQLiteBackend(Backend):
+    """A small thread-safe pool of connections to one SQLite file."""
+
+    dialect = "sqlite"
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        # Statements are compiled once per connection and reused from sqlite3's cache
+        conn = sqlite3.connect(
+            self.path, check_same_thread=False, cached_statements=256, factory=TracedConnection
+        )
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def begin_write(self, conn: sqlite3.Connection) -> None:
+        # Take the write lock up front instead of upgrading a read transaction later
+        conn.execute("BEGIN IMMEDIATE")
+
+    def migrate(self, conn: sqlite3.Connection) -> None:
+        migrations.migrate(conn)
+
+    def next_ids(self, conn: sqlite3.Connection, table: str, count: int) -> list[int]:
+        # Past both the largest id and AUTOINCREMENT's high-water mark, so ids are never
+        # reused; callers hold the write lock until the rows are inserted
+        start = conn.execute(f"""
+            SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = '{table}'), 0),
+                       COALESCE((SELECT MAX(id) FROM {table}), 0)) + 1
+        """).fetchone()[0]
+        return list(range(start, start + count))
+
+    def stream(self, conn: sqlite3.Connection, sql: str, parameters: Any, size: int) -> Iterator[list[tuple]]:
+        # SQLite steps the query as rows are fetched, so only one chunk is ever in memory
+        cursor = conn.execute(sql, parameters)
+        while rows := cursor.fetchmany(size):
+            yield rows
+
+    def is_contention(self, error: Exception) -> bool:
+        # busy_timeout already waited; these are what is left when it runs out
+        return isinstance(error, sqlite3.OperationalError) and (
+            "locked" in str(error) or "busy" in str(error)
+        )
+
+    def is_invalid_data(self, error: Exception) -> bool:
+        # ProgrammingError: a value sqlite3 cannot bind, such as a list
+        return isinstance(error, (sqlite3.IntegrityError, sqlite3.ProgrammingError))
+
+    def explain(self, conn: sqlite3.Connection, stat: QueryStat) -> list[str]:
+        if stat.many:
+            return ["(executemany: plan not captured)"]
+        rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {stat.sql}", stat.params).fetchall()
+        return [row[-1] for row in rows]
+
+    def vacuum(self) -> None:
+        # VACUUM rewrites the file through the WAL; the checkpoint then shrinks the WAL too
+        with self.connection() as conn:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA optimize")
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+# === PostgreSQL, through psycopg 3 and psycopg_pool (both optional)
+
+# String literals, quoted identifiers, comments and casts keep their placeholder-like
+# characters; psycopg still sees every % in the statement, so those are doubled
+_PLACEHOLDER = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|--[^\n]*|::|:(\w+)|\?|%")
+
+
+@lru_cache(maxsize=512)
+def to_psycopg(sql: str) -> str:
+    """Rewrite sqlite3 placeholders (``?``, ``:name``) in psycopg's paramstyle (``%s``, ``%(name)s``)."""
+    def replace(match: re.Match) -> str:
+        token = match.group(0)
+        if match.group(1):
+            return f"%({match.group(1)})s"
+        if token == "?":
+            return "%s"
+        return token.replace("%", "%%")
+    return _PLACEHOLDER.sub(replace, sql)
+
+
+class PostgresConnection:
+    """A psycopg connection with sqlite3's execute/executemany, so queries stay dialect-free."""
+
+    def __init__(self, raw: Any):
+        self.raw = raw
+
+    def execute(self, sql: str, parameters: Any = ()) -> TracedCursorProxy:
+        cursor = TracedCursorProxy(self.raw.cursor())
+        # Without parameters psycopg sends the statement as is (and allows several of them)
+        if parameters:
+            cursor.execute(to_psycopg(sql), parameters)
+        else:
+            cursor.execute(sql, None)
+        return cursor
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> TracedCursorProxy:
+        cursor = TracedCursorProxy(self.raw.cursor())
+        cursor.executemany(to_psycopg(sql), list(seq_of_parameters))
+        return cursor
+
+    def commit(self) -> None:
+        self.raw.commit()
+
+    def rollback(self) -> None:
+        self.raw.rollback()
+
+
+class PostgresBackend(Backend):
+    """A psycopg_pool connection pool; shareable by many Streamlit servers and replicas."""
+
+    dialect = "postgresql"
+
+    def __init__(self, dsn: str, pool_size: int = 4):
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError:
+            raise RuntimeError("PostgreSQL storage requires psycopg 3 and psycopg_pool (pip install 'psycopg[pool]')")
+        self._pool = ConnectionPool(dsn, min_size=1, max_size=pool_size, open=True)
+
+    @contextmanager
+    def connection(self) -> Iterator[PostgresConnection]:
+        # The pool commits anything left open on return, or rolls it back after an error
+        with self._pool.connection() as raw:
+            yield PostgresConnection(raw)
+
+    def begin_write(self, conn: PostgresConnection) -> None:
+        # One snapshot for the whole batch: rows committed meanwhile stay invisible, and
+        # touching a row changed meanwhile fails the transaction instead of losing the change
+        conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+    def migrate(self, conn: PostgresConnection) -> None:
+        migrations.migrate_postgres(conn)
+
+    def next_ids(self, conn: PostgresConnection, table: str, count: int) -> list[int]:
+        rows = conn.execute(
+            "SELECT nextval(pg_get_serial_sequence(?, 'id')) FROM generate_series(1, ?)", (table, count)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def stream(self, conn: PostgresConnection, sql: str, parameters: Any, size: int) -> Iterator[list[tuple]]:
+        # A named cursor is declared on the server; psycopg's default cursor would
+        # transfer the whole result when the query runs
+        cursor = TracedCursorProxy(conn.raw.cursor(name=f"stream_{next(_stream_ids)}"))
+        try:
+            cursor.execute(to_psycopg(sql), parameters)
+            while rows := cursor.fetchmany(size):
+                yield rows
+        finally:
+            cursor.close()
+
+    def is_contention(self, error: Exception) -> bool:
+        return getattr(error, "sqlstate", None) in POSTGRES_CONTENTION
+
+    def is_invalid_data(self, error: Exception) -> bool:
+        # Class 22 is data exceptions, class 23 integrity constraint violations
+        return (getattr(error, "sqlstate", None) or "")[:2] in ("22", "23")
+
+    def explain(self, conn: PostgresConnection, stat: QueryStat) -> list[str]:
+        if stat.many:
+            return ["(executemany: plan not captured)"]
+        rows = conn.raw.execute(f"EXPLAIN {stat.sql}", stat.params).fetchall()
+        return [row[0] for row in rows]
+
+    def vacuum(self) -> None:
+        # VACUUM cannot run inside a transaction block
+        with self._pool.connection() as raw:
+            raw.autocommit = True
+            try:
+                raw.execute("VACUUM (ANALYZE)")
+            finally:
+                raw.autocommit = False
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+def open_backend(database: str, pool_size: int = 4) -> Backend:
+    """A PostgreSQL backend for a ``postgresql://`` URL, otherwise SQLite at that path."""
+    if database.startswith(POSTGRES_SCHEMES):
+        return PostgresBackend(database, pool_size)
+    return SQLiteBackend(database, pool_size)
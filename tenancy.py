@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from db import Repository
+from query_cache import QueryCache
+from storage import Connection
+
+# shared: everyone in one database. user: one SQLite file per user.
+# hash: users spread over a fixed number of SQLite files by a hash of their username.
+MODES = ("shared", "user", "hash")
+SHARD_DIR = "shards"
+DEFAULT_SHARDS = 16
+# Connections per shard file; a shard only serves its own users' sessions
+TENANT_POOL_SIZE = 2
+
+# The program catalog lives in the shared database; every shard keeps a copy, ids
+# included, so workouts join their plan locally
+CATALOG_TABLES = ("programs", "sessions", "session_exercises")
+# A user's rows, parents first, and how to select them in the database attached as {schema}
+USER_TABLES = {
+    "workout_logs": "WHERE username = :username",
+    "exercise_logs": "WHERE workout_log_id IN (SELECT id FROM {schema}.workout_logs WHERE username = :username)",
+    "set_logs": """WHERE exercise_log_id IN (
+        SELECT el.id FROM {schema}.exercise_logs el
+        JOIN {schema}.workout_logs wl ON wl.id = el.workout_log_id
+        WHERE wl.username = :username)""",
+    "workout_summaries": "WHERE workout_log_id IN (SELECT id FROM {schema}.workout_logs WHERE username = :username)",
+    "personal_bests": "WHERE username = :username",
+    "archived_bests": "WHERE username = :username",
+}
+# The tables keyed by username; exercise, set and summary rows cascade from workouts
+USER_ROOTS = ("workout_logs", "personal_bests", "archived_bests")
+# What the user logged. Bests are derived from it and change in place, so they
+# tell nothing about which copy is newer.
+LOGGED_TABLES = tuple(table for table in USER_TABLES if not table.endswith("_bests"))
+
+
+@dataclass
+class ShardSplit:
+    copied: list[str] = field(default_factory=list)
+    # Copied by an earlier run and still identical to the shared database
+    unchanged: list[str] = field(default_factory=list)
+    # Changed in both databases since an earlier run copied them; left alone and never purged
+    diverged: list[str] = field(default_factory=list)
+
+
+def shard_name(username: str, mode: str, shards: int = DEFAULT_SHARDS) -> str:
+    """The file name (without ``.db``) holding the user's data.
+
+    Per-user names keep a readable prefix and add a digest, since different
+    usernames can reduce to the same safe prefix.
+    """
+    digest = hashlib.sha1(username.encode()).hexdigest()
+    if mode == "user":
+        return f"user-{re.sub(r'[^A-Za-z0-9_.-]', '_', username)[:40]}-{digest[:8]}"
+    if mode == "hash":
+        return f"shard-{int(digest[:8], 16) % shards:03d}"
+    raise ValueError(f"Mode {mode!r} has no shard files")
+
+
+def shard_paths(directory: str) -> list[Path]:
+    return sorted(Path(directory).glob("*.db"))
+
+
+def columns(conn: Connection, table: str, schema: str = "main") -> str:
+    return ", ".join(row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})"))
+
+
+def copy_catalog(source: Connection, target: Connection) -> None:
+    """Make ``target``'s programs, sessions and catalog version match ``source``'s.
+
+    Programs only ``target`` has, such as one a restore created (see
+    ``training_log.import_log``), are kept along with their workouts. They move
+    to the source's program of the same name, or else to an id the source does
+    not use yet, so syncing never renames them or collides with them.
+    """
+    programs = dict(source.execute("SELECT id, name FROM programs").fetchall())
+    local = [(program_id, name) for program_id, name in target.execute("SELECT id, name FROM programs")
+             if programs.get(program_id) != name]
+    # Park them under spare ids and names first, so the source's rows can go in as they are
+    spare = max([*programs, *(program_id for program_id, _ in local), 0]) + 1
+    parked = []
+    for offset, (program_id, name) in enumerate(local):
+        _move_program(target, program_id, spare + offset, f"{name} (moving #{program_id})")
+        parked.append((spare + offset, name))
+    target.executemany("""
+        INSERT INTO programs (id, name) VALUES (?, ?)
+        ON CONFLICT (id) DO UPDATE SET name = excluded.name
+    """, list(programs.items()))
+    by_name = {name: program_id for program_id, name in programs.items()}
+    for program_id, name in parked:
+        if name in by_name:
+            _move_program(target, program_id, by_name[name])
+        else:
+            target.execute("UPDATE programs SET name = ? WHERE id = ?", (name, program_id))
+    # Sessions are replaced wholesale, as import_program does; session_exercises cascade
+    target.execute("DELETE FROM sessions")
+    for table in CATALOG_TABLES[1:]:
+        names = columns(target, table)
+        rows = source.execute(f"SELECT {names} FROM {table}").fetchall()
+        if rows:
+            target.executemany(
+                f"INSERT INTO {table} ({names}) VALUES ({', '.join('?' * len(rows[0]))})", rows
+            )
+    target.execute("UPDATE catalog_version SET version = ? WHERE id = 1", (source.execute(
+        "SELECT version FROM catalog_version WHERE id = 1"
+    ).fetchone()[0],))
+
+
+def _move_program(conn: Connection, program_id: int, new_id: int, new_name: Optional[str] = None) -> None:
+    # Repoint the workouts and drop the old row; without new_name the new row exists already
+    if new_name is not None:
+        conn.execute("INSERT INTO programs (id, name) VALUES (?, ?)", (new_id, new_name))
+    conn.execute("UPDATE workout_logs SET program_id = ? WHERE program_id = ?", (new_id, program_id))
+    conn.execute("DELETE FROM programs WHERE id = ?", (program_id,))
+
+
+class Tenants:
+    """Routes each user to the repository holding their workouts.
+
+    ``catalog`` is the shared database: the program catalog and, in shared mode,
+    everyone's workouts. Other modes open SQLite shard files under ``directory``
+    on first use and keep them for the life of the process. All repositories
+    share one query cache, which is keyed by username anyway.
+    """
+
+    def __init__(self, database: str, mode: str = "shared", directory: str = SHARD_DIR,
+                 shards: int = DEFAULT_SHARDS, pool_size: int = 4, tenant_pool_size: int = TENANT_POOL_SIZE,
+                 program: Optional[str] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown tenancy mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.directory = Path(directory)
+        self.shards = shards
+        self.tenant_pool_size = tenant_pool_size
+        self.query_cache = QueryCache()
+        self.catalog = Repository(database, pool_size, self.query_cache, program)
+        if mode != "shared":
+            if self.catalog.backend.dialect != "sqlite":
+                raise ValueError("Shard files are SQLite; a PostgreSQL database is always shared")
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._repositories: dict[str, Repository] = {}
+        self._lock = threading.Lock()
+
+    def for_user(self, username: str) -> Repository:
+        if self.mode == "shared":
+            return self.catalog
+        name = shard_name(username, self.mode, self.shards)
+        with self._lock:
+            repo = self._repositories.get(name)
+            if repo is None:
+                repo = self._repositories[name] = self._open(name)
+            return repo
+
+    def _open(self, name: str) -> Repository:
+        repo = Repository(str(self.directory / f"{name}.db"), self.tenant_pool_size, self.query_cache)
+        self._sync(repo, self.catalog.catalog_version())
+        repo.program_id = self.catalog.program_id
+        return repo
+
+    def _sync(self, repo: Repository, version: int) -> None:
+        with repo.connection() as conn:
+            current = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+            loaded = conn.execute("SELECT EXISTS (SELECT 1 FROM programs)").fetchone()[0]
+        if current != version or not loaded:
+            with self.catalog.connection() as source, repo.transaction(immediate=True) as target:
+                copy_catalog(source, target)
+
+    def sync_catalog(self) -> None:
+        """Pick up a changed program catalog (see ``get_catalog`` in ui.py).
+
+        The configured program may only exist since the change, so its id is
+        resolved again; open shards get a copy of the catalog and that id.
+        """
+        version = self.catalog.catalog_version()
+        self.catalog.refresh_program()
+        with self._lock:
+            for repo in self._repositories.values():
+                self._sync(repo, version)
+                repo.program_id = self.catalog.program_id
+
+    def close(self) -> None:
+        with self._lock:
+            for repo in self._repositories.values():
+                repo.close()
+            self._repositories.clear()
+        self.catalog.close()
+
+
+def split(database: str, directory: str, mode: str, shards: int = DEFAULT_SHARDS,
+          purge: bool = False) -> dict[str, ShardSplit]:
+    """Copy every user's workouts from the shared SQLite ``database`` into shard files.
+
+    Ids are kept, so each shard's rows match the source's one for one, which
+    makes a rerun safe: a user the shard already holds is copied again only if
+    the shared database has gained or changed rows since and the shard copy has
+    not (it is then replaced), and is reported as diverged if both have. With
+    ``purge`` the users whose shard copy is complete are then deleted from the
+    shared database and it is vacuumed. Run it with the app stopped. Returns
+    what happened to each shard's users.
+    """
+    source = Repository(database, pool_size=1)
+    try:
+        if source.backend.dialect != "sqlite":
+            raise ValueError("Only a shared SQLite database can be split into shard files")
+        with source.connection() as conn:
+            users = [row[0] for row in conn.execute("""
+                SELECT username FROM workout_logs UNION SELECT username FROM personal_bests ORDER BY 1
+            """)]
+        placement: dict[str, list[str]] = {}
+        for username in users:
+            placement.setdefault(shard_name(username, mode, shards), []).append(username)
+
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        results: dict[str, ShardSplit] = {}
+        for name, usernames in placement.items():
+            shard = Repository(str(Path(directory) / f"{name}.db"), pool_size=1)
+            try:
+                with source.connection() as conn, shard.transaction(immediate=True) as target:
+                    copy_catalog(conn, target)
+                with shard.connection() as conn:
+                    conn.execute("ATTACH DATABASE ? AS source", (database,))
+                    try:
+                        results[name] = _copy_users(shard, conn, usernames)
+                    finally:
+                        conn.execute("DETACH DATABASE source")
+            finally:
+                shard.close()
+
+        if purge:
+            done = [(username,) for result in results.values() for username in result.copied + result.unchanged]
+            with source.transaction(immediate=True) as conn:
+                for table in USER_ROOTS:
+                    conn.executemany(f"DELETE FROM {table} WHERE username = ?", done)
+            source.backend.vacuum()
+        return results
+    finally:
+        source.close()
+
+
+def _copy_users(shard: Repository, conn: Connection, usernames: list[str]) -> ShardSplit:
+    # One transaction on the connection the source is attached to
+    result = ShardSplit()
+    shard.backend.begin_write(conn)
+    try:
+        for username in usernames:
+            present = conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM workout_logs WHERE username = ?)"
+                " OR EXISTS (SELECT 1 FROM personal_bests WHERE username = ?)", (username, username)
+            ).fetchone()[0]
+            if present and _contains(conn, username, "main", "source"):
+                result.unchanged.append(username)
+                continue
+            if present and not _contains(conn, username, "source", "main", LOGGED_TABLES):
+                result.diverged.append(username)
+                continue
+            # Not copied yet, or the shard copy is only missing what the source gained
+            for table in USER_ROOTS:
+                conn.execute(f"DELETE FROM main.{table} WHERE username = ?", (username,))
+            for table, where in USER_TABLES.items():
+                names = columns(conn, table)
+                conn.execute(
+                    f"INSERT INTO {table} ({names}) SELECT {names} FROM source.{table} "
+                    + where.format(schema="source"),
+                    {"username": username},
+                )
+            result.copied.append(username)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return result
+
+
+def _contains(conn: Connection, username: str, outer: str, inner: str,
+              tables: tuple[str, ...] = tuple(USER_TABLES)) -> bool:
+    # Whether every one of the user's rows in ``inner`` is in ``outer`` as it is
+    for table in tables:
+        where = USER_TABLES[table]
+        names = columns(conn, table)
+        missing = conn.execute(f"""
+            SELECT EXISTS (
+                SELECT {names} FROM {inner}.{table} {where.format(schema=inner)}
+                EXCEPT
+                SELECT {names} FROM {outer}.{table} {where.format(schema=outer)}
+            )
+        """, {"username": username}).fetchone()[0]
+        if missing:
+            return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Split a shared SQLite database into per-user or hashed shards.")
+    parser.add_argument("--db", default="workouts.db", help="shared SQLite database (default: workouts.db)")
+    parser.add_argument("--dir", default=SHARD_DIR, help=f"shard directory (default: {SHARD_DIR})")
+    parser.add_argument("--mode", choices=MODES[1:], default="hash")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS,
+                        help=f"shard files in hash mode (default: {DEFAULT_SHARDS})")
+    parser.add_argument("--purge", action="store_true", help="delete moved users from the shared database")
+    args = parser.parse_args()
+
+    results = split(args.db, args.dir, args.mode, args.shards, args.purge)
+    for name, result in sorted(results.items()):
+        print(f"✅ {name}: {len(result.copied)} users copied"
+              + (f" ({', '.join(result.copied)})" if result.copied else "")
+              + (f", {len(result.unchanged)} already there" if result.unchanged else ""))
+        for username in result.diverged:
+            print(f"⚠️ {name}: {username} changed in {args.db} since it was copied; "
+                  "left in both databases (not purged)")
+    print(f"Set tenancy.mode = \"{args.mode}\" and tenancy.directory = \"{args.dir}\" in secrets.toml"
+          + (f" with tenancy.shards = {args.shards}" if args.mode == "hash" else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Shared fixtures: every scenario runs once per storage backend.
+
+The PostgreSQL runs need a throwaway database, given as a URL in
+TEST_POSTGRES_DSN (e.g. postgresql://postgres@localhost/tracker_test); its
+public schema is dropped before each test. Without it they are skipped.
+"""
+import os
+
+import pytest
+
+from db import Repository
+from program_import import ParsedSession, import_program
+
+PROGRAM = "Test program"
+SESSIONS = [
+    ParsedSession("Day A", sets=3, reps=5, exercises=["Squat", "Bench Press"]),
+    ParsedSession("Day B", sets=1, reps=1, exercises=["Deadlift"]),
+]
+
+
+def _reset_postgres(dsn: str) -> None:
+    import psycopg
+
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("DROP SCHEMA public CASCADE")
+        conn.execute("CREATE SCHEMA public")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database(request, tmp_path) -> str:
+    if request.param == "sqlite":
+        return str(tmp_path / "workouts.db")
+    dsn = os.environ.get("TEST_POSTGRES_DSN")
+    if not dsn:
+        pytest.skip("TEST_POSTGRES_DSN is not set")
+    pytest.importorskip("psycopg_pool")
+    _reset_postgres(dsn)
+    return dsn
+
+
+@pytest.fixture
+def repo(database):
+    # The program has to exist before a Repository can select it
+    setup = Repository(database, pool_size=1)
+    with setup.transaction() as conn:
+        import_program(conn, PROGRAM, SESSIONS)
+    setup.close()
+
+    repo = Repository(database, pool_size=2, program=PROGRAM)
+    yield repo
+    repo.close()
+
+
+@pytest.fixture
+def log_workout(repo):
+    """Log a completed Day A workout: ``{exercise: [weight per set]}`` on ``on_date``."""
+    def log(username: str, on_date: str, weights: dict[str, list[float]]) -> dict[str, int]:
+        workout_log_id, exercise_log_ids = repo.create_workout(
+            username, 1, [(name, len(sets)) for name, sets in weights.items()], on_date
+        )
+        repo.upsert_sets([
+            (exercise_log_ids[name], number, weight)
+            for name, sets in weights.items()
+            for number, weight in enumerate(sets, start=1)
+        ])
+        repo.finish_workout(username, workout_log_id)
+        return exercise_log_ids
+    return log
@@ -0,0 +1,18 @@
+import catalog
+
+
+def test_sessions_are_looked_up_by_index(repo):
+    with repo.transaction() as conn:
+        # Day A has no exercises left, and Day C was added with a gap in the numbering
+        conn.execute("DELETE FROM session_exercises WHERE session_id IN (SELECT id FROM sessions WHERE name = 'Day A')")
+        conn.execute("INSERT INTO sessions (program_id, session_index, name) VALUES (?, 4, 'Day C')",
+                     (repo.program_id,))
+
+    program = catalog.load(repo).program(repo.program_id)
+
+    assert [(s.index, s.name, len(s.exercises)) for s in program.sessions] == [
+        (1, "Day A", 0), (2, "Day B", 1), (4, "Day C", 0)
+    ]
+    assert program.session(2).name == "Day B"
+    assert program.session(3) is None
+    assert [program.next_session(last) for last in (None, 1, 2, 4)] == [1, 2, 4, 1]
@@ -0,0 +1,64 @@
+import io
+
+import analytics
+import catalog
+import retention
+import training_log
+
+
+def progress(repo, username):
+    report = analytics.progress_report(repo, catalog.load(repo), username)
+    # NaN marks sessions without the exercise; it would never compare equal
+    return report.top_sets.fillna(0).to_dict(), report.weekly_tonnage.to_dict(), report.plateaus.to_dict()
+
+
+def test_compaction_keeps_progress_and_bests(repo, log_workout):
+    log_workout("alice", "2024-01-01", {"Squat": [100, 110, 105], "Bench Press": [60, 62.5, 60]})
+    log_workout("alice", "2024-01-03", {"Squat": [112.5, 100, 100]})
+    log_workout("alice", "2026-01-05", {"Squat": [115, 115, 115]})
+    before = progress(repo, "alice"), repo.personal_bests("alice")
+
+    summaries = retention.compact(repo, "2025-01-01")
+
+    assert [(s.username, s.workouts, s.sets) for s in summaries] == [("alice", 2, 9)]
+    repo.query_cache.bump("alice")
+    assert (progress(repo, "alice"), repo.personal_bests("alice")) == before
+    # Only the recent workout keeps its sets, so only it is listed in the history
+    assert len(repo.workout_page("alice", 10)[0]) == 1
+    # Compacting again finds nothing left to roll up
+    assert retention.compact(repo, "2025-01-01")[0].workouts == 0
+
+
+def test_compacted_workouts_survive_export_and_archive(repo, log_workout, tmp_path):
+    log_workout("alice", "2024-01-01", {"Squat": [100, 110, 105]})
+    log_workout("alice", "2026-01-05", {"Squat": [115, 115, 115]})
+    retention.compact(repo, "2025-01-01")
+    expected = progress(repo, "alice")
+
+    out = io.BytesIO()
+    training_log.export_user(repo, "alice", out, "ndjson")
+    out.seek(0)
+    assert training_log.import_log(repo, out, "carol").sets == 6
+    assert progress(repo, "carol") == expected
+
+    path = training_log.archive_user(repo, "alice", "2025-01-01", tmp_path, "ndjson")
+    with repo.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM workout_summaries").fetchone()[0] == 1  # carol's
+    assert training_log.import_log(repo, path, "alice").workouts == 1
+    assert progress(repo, "alice") == expected
+
+
+def test_archived_bests_survive_a_recompute(repo, log_workout, tmp_path):
+    log_workout("alice", "2024-01-01", {"Squat": [150, 140, 140], "Bench Press": [80, 80, 80]})
+    log_workout("alice", "2026-01-05", {"Squat": [115, 115, 115]})
+    before = repo.personal_bests("alice")
+    training_log.archive_user(repo, "alice", "2025-01-01", tmp_path, "ndjson")
+
+    # Importing a log recomputes the bests of the exercises it holds
+    out = io.BytesIO()
+    training_log.export_user(repo, "alice", out, "ndjson")
+    out.seek(0)
+    training_log.import_log(repo, out, "alice")
+    retention.compact(repo, "2027-01-01")
+
+    assert repo.personal_bests("alice") == before
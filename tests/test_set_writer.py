@@ -0,0 +1,110 @@
+import sqlite3
+
+import pytest
+
+from set_buffer import SetLogBuffer
+from set_writer import SetWriter
+
+
+@pytest.fixture
+def writer(repo):
+    writer = SetWriter(lambda _: repo, group_commit_ms=5)
+    yield writer
+    writer.close(5)
+
+
+def test_submitted_sets_are_written(repo, writer):
+    workout_log_id, ids = repo.create_workout("alice", 1, [("Squat", 3)], "2026-01-05")
+    buffer = SetLogBuffer(repo, writer, "alice", workout_log_id, ids.values())
+    buffer.set(ids["Squat"], 1, 100)
+    buffer.set(ids["Squat"], 1, 105)
+
+    assert buffer.flush(5)
+    assert repo.get_set_logs([ids["Squat"]]) == {(ids["Squat"], 1): 105}
+    assert buffer.count(ids["Squat"]) == 1
+    assert writer.status("alice").failed == 0
+
+
+def test_failed_sets_stay_unsaved_until_retried(repo, writer):
+    workout_log_id, ids = repo.create_workout("alice", 1, [("Squat", 3)], "2026-01-05")
+    missing = max(ids.values()) + 1000
+    buffer = SetLogBuffer(repo, writer, "alice", workout_log_id, [*ids.values(), missing])
+    buffer.set(missing, 1, 100)
+
+    # The foreign key fails: nothing is written and the set is not counted as logged
+    assert not buffer.flush(5)
+    assert buffer.count(missing) == 0
+    assert writer.failed("alice") == {(missing, 1): 100}
+
+    # Other sets still save, and the failure is not forgotten meanwhile
+    buffer.set(ids["Squat"], 1, 100)
+    assert not buffer.flush(5)
+    assert repo.get_set_logs([ids["Squat"]]) == {(ids["Squat"], 1): 100}
+    status = writer.status("alice")
+    assert (status.failed, status.pending) == (1, 0) and status.error
+
+    # Retrying fails again here; a new weight for the set replaces the failed one
+    writer.retry("alice")
+    assert not writer.wait("alice", 5)
+    writer.submit("alice", [(ids["Squat"], 2, 110)])
+    writer.submit("alice", [(missing, 1, 90)])
+    assert not writer.wait("alice", 5)
+    assert writer.failed("alice") == {(missing, 1): 90}
+
+    # Once the write can succeed, retrying saves it and clears the failure
+    with repo.transaction() as conn:
+        conn.execute("INSERT INTO exercise_logs (id, workout_log_id, exercise_name) VALUES (?, ?, 'Bench Press')",
+                     (missing, workout_log_id))
+    writer.retry("alice")
+    assert buffer.flush(5)
+    assert writer.status("alice").failed == 0
+    assert repo.get_set_logs([missing]) == {(missing, 1): 90}
+    assert buffer.count(missing) == 1
+
+
+def test_sets_fail_once_the_database_stays_locked(repo, monkeypatch):
+    workout_log_id, ids = repo.create_workout("alice", 1, [("Squat", 3)], "2026-01-05")
+    writer = SetWriter(lambda _: repo, group_commit_ms=5, retry_seconds=0.2)
+    try:
+        def locked(sets):
+            raise sqlite3.OperationalError("database is locked")
+        monkeypatch.setattr(repo.backend, "is_contention", lambda e: isinstance(e, sqlite3.OperationalError))
+        monkeypatch.setattr(repo, "upsert_sets", locked)
+        writer.submit("alice", [(ids["Squat"], 1, 100), (ids["Squat"], 2, 105)])
+
+        # The writer gives up instead of waiting for the lock forever
+        assert not writer.wait("alice", 5)
+        assert writer.failed("alice") == {(ids["Squat"], 1): 100, (ids["Squat"], 2): 105}
+        assert "busy" in writer.status("alice").error
+
+        monkeypatch.undo()
+        writer.retry("alice")
+        assert writer.wait("alice", 5)
+        assert repo.get_set_logs([ids["Squat"]]) == {(ids["Squat"], 1): 100, (ids["Squat"], 2): 105}
+    finally:
+        writer.close(5)
+
+
+def test_a_database_that_cannot_be_opened_fails_only_its_users_sets(repo):
+    _, ids = repo.create_workout("alice", 1, [("Squat", 3)], "2026-01-05")
+
+    def repository_for(username):
+        if username == "bob":
+            raise OSError("unable to open shard")
+        return repo
+
+    writer = SetWriter(repository_for, group_commit_ms=5)
+    try:
+        writer.submit("bob", [(1, 1, 100)])
+        writer.submit("alice", [(ids["Squat"], 1, 100)])
+        assert not writer.wait("bob", 5)
+        assert writer.wait("alice", 5)
+        assert writer.failed("bob") == {(1, 1): 100}
+        assert "unable to open shard" in writer.status("bob").error
+
+        # The writer thread lives on
+        writer.submit("alice", [(ids["Squat"], 2, 110)])
+        assert writer.wait("alice", 5)
+        assert repo.get_set_logs([ids["Squat"]]) == {(ids["Squat"], 1): 100, (ids["Squat"], 2): 110}
+    finally:
+        writer.close(5)
@@ -0,0 +1,115 @@
+import gzip
+import io
+import json
+
+import pytest
+
+import migrations
+import training_log
+
+
+def bests(repo, username):
+    return {name: (weight, weight_date) for name, weight, weight_date, _, _ in repo.personal_bests(username)}
+
+
+def sets_by_exercise(repo, username):
+    workouts, _ = repo.workout_page(username, 100)
+    result = {}
+    for _, _, name, _, set_number, weight in repo.page_sets(tuple(workout[0] for workout in workouts)):
+        if set_number is not None:
+            result.setdefault(name, []).append(weight)
+    return {name: sorted(weights) for name, weights in result.items()}
+
+
+def test_migrate_is_idempotent(repo):
+    with repo.connection() as conn:
+        repo.backend.migrate(conn)
+        if repo.backend.dialect == "sqlite":
+            version = migrations.schema_version(conn)
+        else:
+            version = conn.execute("SELECT version FROM schema_version").fetchone()[0]
+        assert version == migrations.LATEST_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM workout_summaries").fetchone()[0] == 0
+    assert repo.program_id is not None
+
+
+def test_upsert_sets_updates_personal_bests(repo, log_workout):
+    ids = log_workout("alice", "2026-01-05", {"Squat": [100, 110, 105], "Bench Press": [60, 60, 60]})
+    log_workout("alice", "2026-01-07", {"Squat": [110, 100, 100]})
+    assert bests(repo, "alice") == {"Squat": (110, "2026-01-05"), "Bench Press": (60, "2026-01-05")}
+
+    # Lowering the best set falls back to the next heaviest, keeping its first date
+    repo.upsert_sets([(ids["Squat"], 2, 90)])
+    assert bests(repo, "alice")["Squat"] == (110, "2026-01-07")
+    assert repo.get_set_logs([ids["Squat"]])[(ids["Squat"], 2)] == 90
+    assert bests(repo, "bob") == {}
+
+
+def test_history_edits(repo, log_workout):
+    ids = log_workout("alice", "2026-01-05", {"Squat": [100, 120, 110]})
+    set_ids = {
+        set_number: set_log_id
+        for _, _, _, set_log_id, set_number, _ in repo.page_sets(tuple(w[0] for w in repo.workout_page("alice", 10)[0]))
+    }
+    # Swap sets 1 and 2, drop set 3, add set 4
+    repo.apply_set_edits(
+        inserts=[(ids["Squat"], 4, 95)],
+        updates=[(set_ids[1], ids["Squat"], 2, 100), (set_ids[2], ids["Squat"], 1, 115)],
+        deletes=[set_ids[3]],
+    )
+    assert repo.get_set_logs([ids["Squat"]]) == {(ids["Squat"], 1): 115, (ids["Squat"], 2): 100,
+                                                 (ids["Squat"], 4): 95}
+    assert bests(repo, "alice") == {"Squat": (115, "2026-01-05")}
+    with repo.connection() as conn:
+        assert conn.execute("SELECT logged_sets FROM workout_logs WHERE username = 'alice'").fetchone()[0] == 3
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "parquet"])
+def test_export_import_round_trip(repo, log_workout, fmt):
+    if fmt == "parquet" and training_log.pq is None:
+        pytest.skip("pyarrow is not installed")
+    log_workout("alice", "2026-01-05", {"Squat": [100, 110, 105], "Bench Press": [60, 62.5, 60]})
+    log_workout("alice", "2026-01-07", {"Squat": [112.5, 100, 100]})
+
+    out = io.BytesIO()
+    rows = training_log.export_user(repo, "alice", out, fmt)
+    assert rows == 9
+    out.seek(0)
+    summary = training_log.import_log(repo, out, "carol")
+
+    assert (summary.workouts, summary.sets) == (2, 9)
+    assert sets_by_exercise(repo, "carol") == sets_by_exercise(repo, "alice")
+    assert bests(repo, "carol") == bests(repo, "alice")
+
+
+def test_export_streams_in_chunks(repo, log_workout):
+    log_workout("alice", "2026-01-05", {"Squat": [100, 110, 105], "Bench Press": [60, 60, 60]})
+    with repo.connection() as conn:
+        chunks = list(repo.backend.stream(conn, training_log.EXPORT_SQL, {"username": "alice", "before": None}, 4))
+    assert [len(chunk) for chunk in chunks] == [4, 2]
+
+
+def ndjson(lines):
+    out = io.BytesIO()
+    with gzip.open(out, "wt") as f:
+        f.writelines(json.dumps(line) + "\n" for line in lines)
+    out.seek(0)
+    return out
+
+
+def test_malformed_imports_fail_cleanly(repo):
+    header = {"username": "alice", "format_version": training_log.FORMAT_VERSION, "columns": training_log.COLUMNS}
+    row = [1, "2026-01-05", 1, "Test program", "completed", None, 3, 10, "Squat", 1, 100.0, 1, None, None, None]
+    corrupt = [io.BytesIO(training_log.GZIP_MAGIC + b"not gzip" * 10), io.BytesIO(gzip.compress(b"[1, 2")[:20])]
+    uploads = [*corrupt, ndjson([header, row, row]), ndjson([header, row[:5]]), ndjson([{"hello": 1}])]
+    if training_log.pq is not None:
+        parquet = io.BytesIO()
+        training_log.pq.write_table(training_log.pa.table({"workout_id": [1]}), parquet)
+        parquet.seek(0)
+        uploads.append(parquet)
+
+    for upload in uploads:
+        with pytest.raises(training_log.TrainingLogError):
+            training_log.import_log(repo, upload, "carol")
+    # Nothing of the rejected imports was kept
+    assert repo.workout_page("carol", 10)[0] == []
@@ -0,0 +1,133 @@
+import gzip
+import io
+import json
+
+import pytest
+
+import catalog
+import tenancy
+import training_log
+from db import Repository
+from program_import import ParsedSession, import_program
+
+
+@pytest.fixture
+def shared(repo, database):
+    if repo.backend.dialect != "sqlite":
+        pytest.skip("shard files are SQLite")
+    return database
+
+
+def workouts(database, username):
+    repo = Repository(database, pool_size=1)
+    try:
+        with repo.connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM workout_logs WHERE username = ?", (username,)
+            ).fetchone()[0]
+    finally:
+        repo.close()
+
+
+def test_split_routes_users_to_their_shards(shared, log_workout, tmp_path):
+    log_workout("alice", "2026-01-05", {"Squat": [100, 110, 105]})
+    log_workout("bob", "2026-01-05", {"Squat": [90, 90, 90]})
+
+    results = tenancy.split(shared, tmp_path / "shards", "user", purge=True)
+
+    assert sorted(u for result in results.values() for u in result.copied) == ["alice", "bob"]
+    assert workouts(shared, "alice") == 0
+    tenants = tenancy.Tenants(shared, "user", tmp_path / "shards", program="Test program")
+    try:
+        alice = tenants.for_user("alice")
+        assert alice is not tenants.for_user("bob")
+        assert [name for name, *_ in alice.personal_bests("alice")] == ["Squat"]
+        assert alice.program_id == tenants.catalog.program_id
+        assert alice.catalog_version() == tenants.catalog.catalog_version()
+    finally:
+        tenants.close()
+
+
+def test_rerun_copies_what_the_shared_database_gained(shared, log_workout, tmp_path):
+    log_workout("alice", "2026-01-05", {"Squat": [100, 110, 105]})
+    tenancy.split(shared, tmp_path / "shards", "hash", shards=2)
+    # Logged in shared mode between the two runs
+    log_workout("alice", "2026-01-07", {"Squat": [120, 120, 120]})
+
+    results = tenancy.split(shared, tmp_path / "shards", "hash", shards=2, purge=True)
+
+    [result] = results.values()
+    assert result.copied == ["alice"]
+    assert workouts(shared, "alice") == 0
+    shard = tenancy.shard_paths(tmp_path / "shards")[0]
+    assert workouts(str(shard), "alice") == 2
+
+
+def test_rerun_keeps_users_changed_on_both_sides(shared, log_workout, tmp_path):
+    log_workout("alice", "2026-01-05", {"Squat": [100, 110, 105]})
+    tenancy.split(shared, tmp_path / "shards", "user")
+    log_workout("alice", "2026-01-07", {"Squat": [120, 120, 120]})
+    tenants = tenancy.Tenants(shared, "user", tmp_path / "shards", program="Test program")
+    try:
+        tenants.for_user("alice").create_workout("alice", 2, [("Deadlift", 1)], "2026-01-08")
+    finally:
+        tenants.close()
+
+    results = tenancy.split(shared, tmp_path / "shards", "user", purge=True)
+
+    [result] = results.values()
+    assert (result.copied, result.unchanged, result.diverged) == ([], [], ["alice"])
+    assert workouts(shared, "alice") == 2
+
+
+def test_catalog_sync_selects_a_program_imported_after_startup(database, tmp_path):
+    tenants = tenancy.Tenants(database, "shared", tmp_path / "shards")
+    try:
+        assert tenants.catalog.program_id is None
+        with tenants.catalog.transaction() as conn:
+            import_program(conn, "Late program", [ParsedSession("Day A", sets=3, reps=5, exercises=["Squat"])])
+
+        tenants.sync_catalog()
+
+        program = catalog.load(tenants.catalog).program(tenants.for_user("alice").program_id)
+        assert program.name == "Late program"
+    finally:
+        tenants.close()
+
+
+def test_catalog_sync_keeps_programs_a_restore_created(shared, tmp_path):
+    rows = [[workout_id, "2026-01-05", 1, program, "completed", None, 1, workout_id, "Squat", 1, 100.0, 1,
+             None, None, None] for workout_id, program in ((1, "Coach B"), (2, "Coach C"))]
+    upload = io.BytesIO()
+    with gzip.open(upload, "wt") as f:
+        f.write(json.dumps({"username": "alice", "format_version": training_log.FORMAT_VERSION,
+                            "columns": training_log.COLUMNS}) + "\n")
+        f.writelines(json.dumps(row) + "\n" for row in rows)
+    upload.seek(0)
+
+    def programs(repo):
+        with repo.connection() as conn:
+            return dict(conn.execute("SELECT id, name FROM programs").fetchall()), conn.execute("""
+                SELECT p.name FROM workout_logs wl JOIN programs p ON p.id = wl.program_id ORDER BY wl.date, wl.id
+            """).fetchall()
+
+    tenants = tenancy.Tenants(shared, "user", tmp_path / "shards", program="Test program")
+    try:
+        shard = tenants.for_user("alice")
+        training_log.import_log(shard, upload)
+        assert programs(shard)[0] == {1: "Test program", 2: "Coach B", 3: "Coach C"}
+        # The shared catalog takes both ids for other programs, and gets Coach B later
+        with tenants.catalog.transaction() as conn:
+            for name in ("Other", "Another", "Coach B"):
+                import_program(conn, name, [ParsedSession("Day A", sets=1, reps=5, exercises=["Squat"])])
+
+        tenants.sync_catalog()
+
+        names, workouts = programs(shard)
+        # Coach B joins the catalog's program; Coach C stays local, under an id the catalog does not use
+        ids = {name: program_id for program_id, name in names.items()}
+        assert ids.pop("Coach C") > 4
+        assert ids == {"Test program": 1, "Other": 2, "Another": 3, "Coach B": 4}
+        assert workouts == [("Coach B",), ("Coach C",)]
+    finally:
+        tenants.close()
@@ -0,0 +1,428 @@
+import argparse
+import gzip
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator, Optional, Union
+
+import personal_bests
+from db import Repository
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # exports fall back to gzip'd NDJSON
+    pa = pq = None
+
+# What a corrupt or malformed file raises while it is read
+READ_ERRORS = (OSError, EOFError, LookupError, TypeError, ValueError) + ((pa.ArrowException,) if pa else ())
+
+FORMAT_VERSION = 2
+CHUNK_ROWS = 10_000
+ARCHIVE_DIR = "archive"
+
+# One row per set. An exercise logged without sets, or a workout without
+# exercises, has Nones for the missing part. A compacted workout (retention.py)
+# has one summary row per exercise instead, with only the summary_* columns and
+# the exercise name filled in. Ids are the source database's and are only used
+# to group rows; imports assign new ones. Version 1 files lack the summary columns.
+COLUMNS = (
+    "workout_id", "date", "session_index", "program", "status", "completed_at", "expected_sets",
+    "exercise_log_id", "exercise_name", "set_number", "weight", "completed",
+    "summary_sets", "summary_top_weight", "summary_total_weight",
+)
+V1_COLUMNS = COLUMNS[:12]
+
+EXPORT_SQL = """
+    SELECT wl.id, wl.date, wl.session_index, p.name, wl.status, wl.completed_at, wl.expected_sets,
+           el.id, el.exercise_name, sl.set_number, sl.weight, CAST(sl.completed AS INTEGER),
+           CAST(NULL AS INTEGER), CAST(NULL AS REAL), CAST(NULL AS REAL)
+    FROM workout_logs wl
+    LEFT JOIN programs p ON p.id = wl.program_id
+    LEFT JOIN exercise_logs el ON el.workout_log_id = wl.id
+    LEFT JOIN set_logs sl ON sl.exercise_log_id = el.id
+    WHERE wl.username = :username
+      AND (CAST(:before AS TEXT) IS NULL OR (wl.date < :before AND wl.status = 'completed'))
+    UNION ALL
+    SELECT wl.id, wl.date, wl.session_index, p.name, wl.status, wl.completed_at, wl.expected_sets,
+           NULL, ws.exercise_name, NULL, NULL, NULL, ws.sets, ws.top_weight, ws.total_weight
+    FROM workout_logs wl
+    LEFT JOIN programs p ON p.id = wl.program_id
+    JOIN workout_summaries ws ON ws.workout_log_id = wl.id
+    WHERE wl.username = :username
+      AND (CAST(:before AS TEXT) IS NULL OR (wl.date < :before AND wl.status = 'completed'))
+    ORDER BY 2, 1, 8, 10
+"""
+
+PARQUET_MAGIC = b"PAR1"
+GZIP_MAGIC = b"\x1f\x8b"
+
+Source = Union[str, Path, IO[bytes]]
+
+
+class TrainingLogError(ValueError):
+    """A file that is not a readable export, or rows the database rejects."""
+
+
+@dataclass
+class ImportSummary:
+    username: str
+    workouts: int
+    sets: int
+
+
+def default_format() -> str:
+    return "parquet" if pq is not None else "ndjson"
+
+
+def suffix(fmt: str) -> str:
+    return ".parquet" if fmt == "parquet" else ".ndjson.gz"
+
+
+def _schema():
+    return pa.schema([
+        ("workout_id", pa.int64()), ("date", pa.string()), ("session_index", pa.int64()),
+        ("program", pa.string()), ("status", pa.string()), ("completed_at", pa.string()),
+        ("expected_sets", pa.int64()), ("exercise_log_id", pa.int64()), ("exercise_name", pa.string()),
+        ("set_number", pa.int64()), ("weight", pa.float64()), ("completed", pa.int8()),
+        ("summary_sets", pa.int64()), ("summary_top_weight", pa.float64()), ("summary_total_weight", pa.float64()),
+    ])
+
+
+# === Export
+
+def _chunks(repo: Repository, conn, username: str, before: Optional[str]) -> Iterator[list[tuple]]:
+    # Read through a server-side cursor, so only one chunk is ever in memory
+    return repo.backend.stream(conn, EXPORT_SQL, {"username": username, "before": before}, CHUNK_ROWS)
+
+
+def _write(chunks: Iterator[list[tuple]], out: Source, username: str, fmt: str) -> int:
+    written = 0
+    if fmt == "parquet":
+        schema = _schema().with_metadata({"username": username, "format_version": str(FORMAT_VERSION)})
+        with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+            for rows in chunks:
+                columns = zip(*rows)
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, column.type) for values, column in zip(columns, schema)], schema=schema
+                ))
+                written += len(rows)
+            if not written:
+                writer.write_table(schema.empty_table())
+        return written
+
+    # NDJSON: a header object, then one array per row in COLUMNS order
+    with gzip.open(out, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"username": username, "format_version": FORMAT_VERSION, "columns": COLUMNS}) + "\n")
+        for rows in chunks:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+            written += len(rows)
+    return written
+
+
+def export_user(repo: Repository, username: str, out: Source,
+                fmt: Optional[str] = None, before: Optional[str] = None) -> int:
+    """Stream a user's training log to ``out``; returns the rows written.
+
+    ``before`` limits the export to completed workouts dated before it.
+    """
+    fmt = fmt or default_format()
+    with repo.connection() as conn:
+        return _write(_chunks(repo, conn, username, before), out, username, fmt)
+
+
+# === Import
+
+def _magic(source: Source) -> bytes:
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            return f.read(4)
+    magic = source.read(4)
+    source.seek(0)
+    return magic
+
+
+def read_log(source: Source) -> tuple[str, Iterator[list[tuple]]]:
+    """The exported username and the rows of an export, in chunks; the format is detected.
+
+    Raises TrainingLogError for a corrupt or malformed file, also while the chunks are read.
+    """
+    try:
+        username, chunks = _read_log(source)
+    except READ_ERRORS as e:
+        raise _unreadable(e) from e
+
+    def checked_chunks() -> Iterator[list[tuple]]:
+        try:
+            yield from chunks
+        except READ_ERRORS as e:
+            raise _unreadable(e) from e
+    return username, checked_chunks()
+
+
+def _unreadable(error: Exception) -> TrainingLogError:
+    if isinstance(error, TrainingLogError):
+        return error
+    return TrainingLogError(f"Not a readable training log export ({type(error).__name__}: {error})")
+
+
+def _read_log(source: Source) -> tuple[str, Iterator[list[tuple]]]:
+    magic = _magic(source)
+    if magic == PARQUET_MAGIC:
+        if pq is None:
+            raise TrainingLogError("Reading .parquet exports requires pyarrow (pip install pyarrow)")
+        parquet = pq.ParquetFile(source)
+        metadata = parquet.schema_arrow.metadata or {}
+        if b"username" not in metadata:
+            raise TrainingLogError("Not a training log export (the Parquet file has no username)")
+        username = metadata[b"username"].decode()
+        present = [name for name in COLUMNS if name in parquet.schema_arrow.names]
+
+        def parquet_chunks() -> Iterator[list[tuple]]:
+            for batch in parquet.iter_batches(batch_size=CHUNK_ROWS, columns=present):
+                columns = batch.to_pydict()
+                missing = [None] * batch.num_rows
+                yield list(zip(*(columns.get(name, missing) for name in COLUMNS)))
+        return username, parquet_chunks()
+
+    if magic[:2] == GZIP_MAGIC:
+        lines = gzip.open(source, "rt", encoding="utf-8")
+        header = json.loads(next(lines))
+        columns = tuple(header.get("columns", ()))
+        if (header.get("format_version"), columns) not in ((1, V1_COLUMNS), (FORMAT_VERSION, COLUMNS)):
+            raise TrainingLogError("Unsupported training log export")
+        padding = (None,) * (len(COLUMNS) - len(columns))
+
+        def ndjson_chunks() -> Iterator[list[tuple]]:
+            chunk = []
+            for number, line in enumerate(lines, start=2):
+                row = json.loads(line)
+                if not isinstance(row, list) or len(row) != len(columns) or not all(
+                    value is None or isinstance(value, (str, int, float)) for value in row
+                ):
+                    raise TrainingLogError(f"Line {number} is not a row of the export")
+                chunk.append(tuple(row) + padding)
+                if len(chunk) == CHUNK_ROWS:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        return header["username"], ndjson_chunks()
+
+    raise TrainingLogError("Not a training log export (expected Parquet or gzip'd NDJSON)")
+
+
+def import_log(repo: Repository, source: Source, username: Optional[str] = None) -> ImportSummary:
+    """Append an export to the database, as ``username`` (default: the exported user).
+
+    Each chunk gets fresh ids reserved from the backend and is inserted with
+    executemany, all in one transaction. Importing the same export twice logs
+    its workouts twice. Summaries of compacted workouts are restored as such.
+    Raises TrainingLogError, with nothing imported, for a file that cannot be
+    read or rows the database rejects.
+    """
+    exported_username, chunks = read_log(source)
+    username = username or exported_username
+    try:
+        with repo.transaction(immediate=True) as conn:
+            workouts, sets = _insert(repo, conn, chunks, username)
+    except Exception as e:
+        # E.g. a set number twice, or a value of the wrong type
+        if not repo.backend.is_invalid_data(e):
+            raise
+        raise TrainingLogError(f"The export's rows were rejected ({type(e).__name__}: {e})") from e
+    repo.query_cache.bump(username)
+    return ImportSummary(username, workouts, sets)
+
+
+def _insert(repo: Repository, conn, chunks: Iterator[list[tuple]], username: str) -> tuple[int, int]:
+    # Returns the workouts and sets imported
+    workout_ids: dict[int, int] = {}
+    exercise_ids: dict[int, int] = {}
+    program_ids: dict[Optional[str], Optional[int]] = {None: None}
+    exercises: set[str] = set()
+    sets = 0
+
+    for rows in chunks:
+        # Reserve ids for the workouts and exercise logs that first appear in this chunk
+        new_workouts = list(dict.fromkeys(row[0] for row in rows if row[0] not in workout_ids))
+        new_exercises = list(dict.fromkeys(
+            row[7] for row in rows if row[7] is not None and row[7] not in exercise_ids
+        ))
+        workout_ids.update(zip(new_workouts, repo.backend.next_ids(conn, "workout_logs", len(new_workouts))))
+        exercise_ids.update(zip(new_exercises, repo.backend.next_ids(conn, "exercise_logs", len(new_exercises))))
+        new_workouts, new_exercises = set(new_workouts), set(new_exercises)
+
+        workouts, exercise_logs, set_logs, summaries = [], [], [], []
+        for (workout_id, workout_date, session_index, program, status, completed_at, expected_sets,
+             exercise_log_id, exercise_name, set_number, weight, completed,
+             summary_sets, summary_top_weight, summary_total_weight) in rows:
+            if program not in program_ids:
+                conn.execute("INSERT INTO programs (name) VALUES (?) ON CONFLICT (name) DO NOTHING", (program,))
+                program_ids[program] = conn.execute(
+                    "SELECT id FROM programs WHERE name = ?", (program,)
+                ).fetchone()[0]
+            if workout_id in new_workouts:
+                new_workouts.discard(workout_id)
+                workouts.append((workout_ids[workout_id], session_index, username, workout_date,
+                                 program_ids[program], status, completed_at, expected_sets))
+            if exercise_log_id in new_exercises:
+                new_exercises.discard(exercise_log_id)
+                exercise_logs.append((exercise_ids[exercise_log_id], workout_ids[workout_id], exercise_name))
+                exercises.add(exercise_name)
+            if set_number is not None:
+                set_logs.append((exercise_ids[exercise_log_id], set_number, weight, bool(completed)))
+            if summary_sets is not None:
+                summaries.append((workout_ids[workout_id], exercise_name, summary_sets,
+                                  summary_top_weight, summary_total_weight))
+                exercises.add(exercise_name)
+
+        conn.executemany("""
+            INSERT INTO workout_logs
+                (id, session_index, username, date, program_id, status, completed_at, expected_sets)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, workouts)
+        conn.executemany(
+            "INSERT INTO exercise_logs (id, workout_log_id, exercise_name) VALUES (?, ?, ?)", exercise_logs
+        )
+        conn.executemany(
+            "INSERT INTO set_logs (exercise_log_id, set_number, weight, completed) VALUES (?, ?, ?, ?)",
+            set_logs
+        )
+        conn.executemany("""
+            INSERT INTO workout_summaries (workout_log_id, exercise_name, sets, top_weight, total_weight)
+            VALUES (?, ?, ?, ?, ?)
+        """, summaries)
+        sets += len(set_logs) + sum(summary[2] for summary in summaries)
+
+    if workout_ids:
+        conn.execute("""
+            UPDATE workout_logs SET logged_sets = (
+                SELECT COUNT(*) FROM exercise_logs el
+                JOIN set_logs sl ON sl.exercise_log_id = el.id
+                WHERE el.workout_log_id = workout_logs.id
+            )
+            WHERE username = ? AND id >= ?
+        """, (username, min(workout_ids.values())))
+    for exercise_name in exercises:
+        personal_bests.recompute(conn, username, exercise_name)
+    return len(workout_ids), sets
+
+
+# === Archive: cold history moves out of the hot database into per-user files
+
+def archive_dir(username: str, directory: Union[str, Path] = ARCHIVE_DIR) -> Path:
+    return Path(directory) / re.sub(r"[^A-Za-z0-9_.-]", "_", username)
+
+
+def archive_files(username: str, directory: Union[str, Path] = ARCHIVE_DIR) -> list[Path]:
+    """The user's archive files, newest first."""
+    folder = archive_dir(username, directory)
+    if not folder.is_dir():
+        return []
+    return sorted((p for p in folder.iterdir() if p.name.endswith((".parquet", ".ndjson.gz"))), reverse=True)
+
+
+def archive_user(repo: Repository, username: str, before: str, directory: Union[str, Path] = ARCHIVE_DIR,
+                 fmt: Optional[str] = None) -> Optional[Path]:
+    """Move the user's completed workouts dated before ``before`` into a new archive file.
+
+    The export and the delete share one write transaction, so nothing logged
+    meanwhile can be lost, and the file only appears once it is complete.
+    Personal bests stay all-time: the archived workouts' bests are kept in
+    ``archived_bests``, where later recomputes still find them.
+    """
+    fmt = fmt or default_format()
+    folder = archive_dir(username, directory)
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"before-{before}{suffix(fmt)}"
+    copy = 1
+    while path.exists():
+        copy += 1
+        path = folder / f"before-{before}-{copy}{suffix(fmt)}"
+    partial = path.with_name(path.name + ".partial")
+
+    with repo.transaction(immediate=True) as conn:
+        try:
+            rows = _write(_chunks(repo, conn, username, before), partial, username, fmt)
+            if not rows:
+                partial.unlink()
+                return None
+            personal_bests.keep_archived(conn, username, before)
+            conn.execute(
+                "DELETE FROM workout_logs WHERE username = ? AND date < ? AND status = 'completed'",
+                (username, before)
+            )
+            os.replace(partial, path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+    repo.query_cache.bump(username)
+    return path
+
+
+def read_archive(path: Union[str, Path]):
+    """An archive file's sets as a read-only frame for the history screen."""
+    import pandas as pd
+
+    _, chunks = read_log(Path(path))
+    frame = pd.DataFrame([row for rows in chunks for row in rows], columns=COLUMNS)
+    frame = frame[frame["set_number"].notna()]
+    return frame[["date", "session_index", "exercise_name", "set_number", "weight"]].rename(columns={
+        "date": "Date", "session_index": "Session", "exercise_name": "Exercise",
+        "set_number": "Set", "weight": "Weight",
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export, import and archive users' training logs.")
+    parser.add_argument("--db", default="workouts.db",
+                        help="SQLite path or postgresql:// URL (default: workouts.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write one user's full training log to a file")
+    export.add_argument("username")
+    export.add_argument("path", type=Path)
+    export.add_argument("--format", choices=["parquet", "ndjson"], default=None)
+
+    restore = commands.add_parser("import", help="append an exported training log")
+    restore.add_argument("path", type=Path)
+    restore.add_argument("--as", dest="username", help="import as this user (default: the exported user)")
+
+    archive = commands.add_parser("archive", help="move completed workouts before a date to archive files")
+    archive.add_argument("--before", required=True, help="ISO date; workouts dated before it are archived")
+    archive.add_argument("--user", dest="users", action="append", help="only this user (repeatable)")
+    archive.add_argument("--dir", default=ARCHIVE_DIR, help=f"archive directory (default: {ARCHIVE_DIR})")
+    archive.add_argument("--format", choices=["parquet", "ndjson"], default=None)
+    args = parser.parse_args()
+
+    if args.command in ("export", "archive") and args.format == "parquet" and pq is None:
+        parser.error("--format parquet requires pyarrow")
+
+    repo = Repository(args.db)
+    try:
+        if args.command == "export":
+            rows = export_user(repo, args.username, args.path, args.format)
+            print(f"✅ {args.username}: {rows} rows written to {args.path}")
+        elif args.command == "import":
+            try:
+                summary = import_log(repo, args.path, args.username)
+            except TrainingLogError as e:
+                raise SystemExit(f"❌ {args.path}: {e}")
+            print(f"✅ {summary.username}: imported {summary.workouts} workouts, {summary.sets} sets")
+        else:
+            users = args.users
+            if not users:
+                with repo.connection() as conn:
+                    users = [row[0] for row in conn.execute("SELECT DISTINCT username FROM workout_logs")]
+            for username in users:
+                path = archive_user(repo, username, args.before, args.dir, args.format)
+                print(f"✅ {username}: archived to {path}" if path else f"– {username}: nothing to archive")
+    finally:
+        repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import atexit
+from typing import Any
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import catalog
+import instrumentation
+from db import Repository
+from set_writer import SetWriter
+from tenancy import Tenants
+
+# How stale a server's view of the catalog version may get after a program import
+CATALOG_CHECK_SECONDS = 30
+
+
+# === Per-process resources, shared by every session and page
+
+
+@st.cache_resource
+def get_tenants() -> Tenants:
+    # One set of pooled repositories per server process, shared by every session.
+    # database_url (postgresql://...) selects PostgreSQL; otherwise SQLite at db_path.
+    # Optional [tenancy] secrets: mode (shared, user or hash), directory, shards.
+    tenancy = st.secrets.get("tenancy", {})
+    return Tenants(
+        st.secrets.get("database_url") or st.secrets.get("db_path", "workouts.db"),
+        mode=tenancy.get("mode", "shared"),
+        directory=tenancy.get("directory", "shards"),
+        shards=tenancy.get("shards", 16),
+        pool_size=st.secrets.get("db_pool_size", 4),
+        program=st.secrets.get("program"),
+    )
+
+
+def get_repository() -> Repository:
+    """The signed-in user's repository: the shared one, or their shard's."""
+    return get_tenants().for_user(st.session_state["username"])
+
+
+@st.cache_resource
+def get_writer() -> SetWriter:
+    # One background writer per process owns set logging for every session; queued
+    # writes are committed on a clean shutdown
+    writer = SetWriter(get_tenants().for_user, group_commit_ms=st.secrets.get("group_commit_ms", 50))
+    atexit.register(writer.close, 5.0)
+    return writer
+
+
+@st.cache_data(ttl=CATALOG_CHECK_SECONDS, show_spinner=False)
+def get_catalog_version() -> int:
+    return get_tenants().catalog.catalog_version()
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def get_catalog(version: int) -> catalog.Catalog:
+    # Loaded once per process and catalog version; pages read the plan from it without
+    # SQL. Open shards get their copy of the new catalog at the same time.
+    tenants = get_tenants()
+    tenants.sync_catalog()
+    return catalog.load(tenants.catalog)
+
+
+def get_plans() -> catalog.Catalog:
+    return get_catalog(get_catalog_version())
+
+
+# === Session state
+
+
+def page_state(page: str) -> dict[str, Any]:
+    """State that belongs to one page; other pages never read or rebuild it.
+
+    Only the active workout (``active_workout`` and ``set_buffer``) is shared,
+    since Home starts it and the Active Workout page logs it.
+    """
+    return st.session_state.setdefault(f"page_{page}", {})
+
+
+def start_workout(session_index: int, workout_log_id: int, exercise_log_ids: dict[str, int],
+                  exercises: list[tuple[str, int, int, float]]) -> None:
+    st.session_state["active_workout"] = {
+        "session_index": session_index,
+        "workout_log_id": workout_log_id,
+        "exercise_log_ids": exercise_log_ids,
+        "exercises": exercises,
+    }
+    st.switch_page("screens/workout.py")
+
+
+def profile_fragment(label: str) -> None:
+    """Profile a fragment's own rerun like a full one; a full rerun is already being profiled."""
+    ctx = get_script_run_ctx()
+    if ctx is not None and ctx.fragment_ids_this_run:
+        instrumentation.begin_rerun(st.session_state, label=label)
+